@@ -15,6 +15,7 @@ class Animator(object):
         dt (float): Time since the last frame was rendered
         finished (bool): Flag indicating whether the animation has completed 
     """
+    __slots__ = ('frames', 'current_frame', 'speed', 'loop', 'dt', 'finished')
 
     def __init__(self, frames=None, speed=20, loop=True):
         if frames is None:
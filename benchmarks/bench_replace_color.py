@@ -0,0 +1,79 @@
+"""
+Micro-benchmark for the color replacement helpers.
+
+Compares the vectorized functions in `replace_color` against the original
+per-pixel loops on a sprite-sized surface and on a full-screen surface.
+
+Run from the project root:
+    python -m benchmarks.bench_replace_color
+"""
+
+import timeit
+import pygame
+import numpy as np
+from constants import *
+from replace_color import replace_color, replace_all_colors, replace_colors, transcolor
+
+
+# The original per-pixel implementations, kept here as the baseline
+def loop_replace_color(surface, c1, c2):
+    arr = pygame.surfarray.pixels3d(surface)
+    for row in arr:
+        for p in row:
+            if (p[0], p[1], p[2]) == c1:
+                (p[0], p[1], p[2]) = c2
+
+
+def loop_replace_all_colors(surface, c):
+    arr = pygame.surfarray.pixels3d(surface)
+    for row in arr:
+        for p in row:
+            if (p[0], p[1], p[2]) != transcolor:
+                (p[0], p[1], p[2]) = c
+
+
+def make_surface(size):
+    surface = pygame.Surface(size)
+    rng = np.random.default_rng(0)
+    palette = np.array([transcolor, (255, 50, 170), (204, 59, 255), (0, 0, 0)], dtype=np.uint8)
+    pygame.surfarray.blit_array(surface, palette[rng.integers(0, len(palette), size)])
+    return surface
+
+
+def bench(func, size, number):
+    surface = make_surface(size)
+    seconds = timeit.timeit(lambda: func(surface), number=number) / number
+    return seconds
+
+
+def main():
+    sizes = {
+        'sprite': (round(SPRITEFACTOR*TILEWIDTH), round(SPRITEFACTOR*TILEHEIGHT)),
+        'screen': (SCREENWIDTH, SCREENHEIGHT+4*TILEHEIGHT),
+    }
+    cases = [
+        ('replace_color', lambda s: loop_replace_color(s, (255, 50, 170), (0, 0, 255)),
+         lambda s: replace_color(s, (255, 50, 170), (0, 0, 255))),
+        ('replace_all_colors', lambda s: loop_replace_all_colors(s, (255, 255, 0)),
+         lambda s: replace_all_colors(s, (255, 255, 0))),
+    ]
+    print(f"{'case':<20}{'surface':<16}{'loop (ms)':>12}{'numpy (ms)':>12}{'speedup':>10}")
+    for label, size in sizes.items():
+        for name, loop, vectorized in cases:
+            number = 20 if label == 'sprite' else 1
+            before = bench(loop, size, number)
+            after = bench(vectorized, size, 200 if label == 'sprite' else 20)
+            print(f"{name:<20}{label + ' ' + str(size[0]) + 'x' + str(size[1]):<16}"
+                  f"{before*1000:>12.3f}{after*1000:>12.3f}{before/after:>9.0f}x")
+
+    # Three substitutions in one pass versus three separate passes
+    palette = [((255, 50, 170), (0, 0, 255)), ((204, 59, 255), (255, 255, 255)), ((0, 0, 0), (255, 0, 0))]
+    batch = [make_surface(sizes['sprite']) for _ in range(32)]
+    separate = timeit.timeit(lambda: [replace_color(batch, old, new) for old, new in palette], number=20) / 20
+    single = timeit.timeit(lambda: replace_colors(batch, palette), number=20) / 20
+    print(f"palette of 3 on a batch of {len(batch)} sprites: "
+          f"{separate*1000:.3f} ms as separate passes, {single*1000:.3f} ms in one pass")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""
+Memory report for the game's entity classes.
+
+Builds a generated level of 1000 cherries, plus the same number of
+platforms, enemies, texts and animators, and prints the bytes each entity
+takes, counting everything allocated with it, such as its sprites object and
+animators. Images are shared and cached, so they are built once beforehand
+and not counted.
+
+With a git ref, the "before" column measures the classes of that commit:
+the tree is exported to a temporary directory and this script is run there
+in a subprocess. Without one, it only isolates what __slots__ save, by
+measuring dict-backed copies of the current classes that also keep the
+per-instance fields the slotted classes moved to class level.
+
+Run from the project root:
+    python -m benchmarks.mem_entities [--baseline REF]
+"""
+
+import os
+import gc
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+import tracemalloc
+import pygame
+import sprites
+from constants import *
+from animation import Animator
+from cherries import Cherry
+from platforms import Platform
+from text import Text
+from enemies import Mummy, Club, Bird, UFO, Orb, Sphere
+from leveldata import GRIDROWS, GRIDCOLS
+
+
+NUMENTITIES = 1000
+# Fields the slotted classes keep at class level instead of on every instance
+CLASSFIELDS = {Cherry: ('collideRadius', 'color', 'points'), Mummy: ('collideRadius',),
+               Club: ('collideRadius',), Bird: ('collideRadius',), UFO: ('collideRadius',),
+               Orb: ('collideRadius',), Sphere: ('collideRadius',)}
+
+
+class Target(object):
+    """Stands in for Bomb Jack, whose position some enemies read when they are built."""
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+
+def unslotted(cls, copies):
+    """Returns a copy of cls and its bases without __slots__, so its instances keep a __dict__."""
+    if cls is object:
+        return object
+    if cls not in copies:
+        slots = set(vars(cls).get('__slots__', ()))
+        namespace = {name: value for name, value in vars(cls).items()
+                     if name not in slots and name not in ('__slots__', '__dict__', '__weakref__')}
+        bases = tuple(unslotted(base, copies) for base in cls.__bases__)
+        copies[cls] = type(cls.__name__, bases, namespace)
+    return copies[cls]
+
+
+def generateLevel():
+    """Returns the constructors of a generated level's entities, NUMENTITIES of each kind."""
+    target = Target(SCREENWIDTH/2, SCREENHEIGHT/2)
+    cells = [(i // GRIDCOLS % GRIDROWS, i % GRIDCOLS) for i in range(NUMENTITIES)]
+    return {
+        Cherry: [lambda Cherry, row=row, col=col, i=i: Cherry(row, col, i % 8)
+                 for i, (row, col) in enumerate(cells)],
+        Platform: [lambda Platform, row=row, col=col:
+                   Platform(col*TILEWIDTH, row*TILEHEIGHT, 3*TILEWIDTH, PLATFORMSIZE, 0) for row, col in cells],
+        Mummy: [lambda Mummy, row=row, col=col: Mummy(target, row, col, None) for row, col in cells],
+        Club: [lambda Club, row=row, col=col: Club(target, col*TILEWIDTH, row*TILEHEIGHT, None)
+               for row, col in cells],
+        Bird: [lambda Bird, row=row, col=col: Bird(target, row, col) for row, col in cells],
+        UFO: [lambda UFO, row=row, col=col: UFO(target, col*TILEWIDTH+1, row*TILEHEIGHT+1, None)
+              for row, col in cells],
+        Orb: [lambda Orb, row=row, col=col: Orb(target, col*TILEWIDTH, row*TILEHEIGHT, None)
+              for row, col in cells],
+        Sphere: [lambda Sphere, row=row, col=col: Sphere(target, col*TILEWIDTH, row*TILEHEIGHT, None)
+                 for row, col in cells],
+        Text: [lambda Text, i=i: Text(str(i*10), WHITE, 0, 0, 10) for i in range(NUMENTITIES)],
+        Animator: [lambda Animator: Animator([(0, 0), (1, 0)]) for _ in range(NUMENTITIES)],
+    }
+
+
+def addClassFields(entity, cls):
+    """Puts back the per-instance references the dict-backed classes held."""
+    for name in CLASSFIELDS.get(cls, ()):
+        setattr(entity, name, getattr(cls, name))
+    if hasattr(entity, 'sprites'):
+        entity.sprites.sheet = entity.sprites.atlas.sheet
+
+
+def measure(constructors, cls, copies=None):
+    """Returns the bytes allocated per entity built by constructors with cls, or its dict-backed copy."""
+    kind = cls if copies is None else unslotted(cls, copies)
+    gc.collect()
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    entities = [construct(kind) for construct in constructors]
+    if copies is not None:
+        for entity in entities:
+            addClassFields(entity, cls)
+    allocated = tracemalloc.get_traced_memory()[0]-start
+    tracemalloc.stop()
+    del entities
+    return allocated/len(constructors)
+
+
+def buildLevel():
+    pygame.font.init()
+    level = generateLevel()
+    # Build every shared image and font before measuring
+    for cls, constructors in level.items():
+        constructors[0](cls)
+    return level
+
+
+def measureTree():
+    """Returns the bytes per entity of each class of the tree this script runs in, by class name."""
+    return {cls.__name__: measure(constructors, cls) for cls, constructors in buildLevel().items()}
+
+
+def measureUnslotted():
+    """Returns the bytes per entity of dict-backed copies of each class, by class name."""
+    copies = {}
+    # The sprites classes build their animators through the sprites module's name for the class
+    dictAnimator = unslotted(Animator, copies)
+    sizes = {}
+    for cls, constructors in buildLevel().items():
+        sprites.Animator = dictAnimator
+        sizes[cls.__name__] = measure(constructors, cls, copies)
+        sprites.Animator = Animator
+    return sizes
+
+
+def measureBaseline(ref):
+    """Returns the bytes per entity of each class as of the git commit ref, measured in a subprocess."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with tempfile.TemporaryDirectory() as tree:
+        archive = subprocess.run(['git', 'archive', ref], cwd=root, check=True, capture_output=True).stdout
+        subprocess.run(['tar', '-x', '-C', tree], input=archive, check=True)
+        # The game's modules are imported from the exported tree, this script from here
+        env = dict(os.environ, PYTHONPATH=tree)
+        result = subprocess.run([sys.executable, os.path.abspath(__file__), '--json'], cwd=tree, env=env,
+                                check=True, capture_output=True, text=True)
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def report(before, after, beforeLabel, afterLabel):
+    print(f"{'entity':<12}{beforeLabel:>14}{afterLabel:>14}{'saved':>8}")
+    for name in after:
+        print(f"{name:<12}{before[name]:>14.0f}{after[name]:>14.0f}{1-after[name]/before[name]:>8.0%}")
+    totals = (sum(before[name] for name in after), sum(after.values()))
+    print(f"{'all kinds':<12}{totals[0]:>14.0f}{totals[1]:>14.0f}{1-totals[1]/totals[0]:>8.0%}")
+    print(f"{NUMENTITIES} cherries: {before['Cherry']*NUMENTITIES/1024:.0f} KiB {beforeLabel.split()[0]}, "
+          f"{after['Cherry']*NUMENTITIES/1024:.0f} KiB {afterLabel.split()[0]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report the memory each game entity takes.")
+    parser.add_argument('--baseline', metavar='REF',
+                        help="git commit whose classes to compare with, instead of dict-backed copies")
+    parser.add_argument('--json', action='store_true', help="print this tree's sizes as JSON, for --baseline")
+    args = parser.parse_args()
+    if args.json:
+        print(json.dumps(measureTree()))
+    elif args.baseline:
+        before = measureBaseline(args.baseline)
+        report(before, measureTree(), f"{args.baseline} (B)", "current (B)")
+    else:
+        print("Slots only: dict-backed copies of the current classes against the classes themselves")
+        report(measureUnslotted(), measureTree(), "dict (B)", "slots (B)")
+
+
+if __name__ == "__main__":
+    main()
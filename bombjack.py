@@ -2,7 +2,7 @@ import pygame
 from pygame.locals import *
 from constants import *
 from sprites import BombjackSprites
-from replace_color import replace_all_colors
+from platforms import moveBox
 
 class Bombjack(object):
     """Handles Bombjack character logic including movement, collisions, and rendering.
@@ -53,7 +53,7 @@ class Bombjack(object):
         self.dying = False
         self.poweredUp = False
 
-    def update(self, dt, platList):
+    def update(self, dt, platforms, keys=None):
         score = 0
         self.sprites.update(dt)
         if self.dancing or self.dying:
@@ -61,8 +61,8 @@ class Bombjack(object):
 
         dx, dy = 0, 0
 
-        # Get keypresses
-        key = pygame.key.get_pressed()
+        # Get keypresses, unless they are supplied (headless runs)
+        key = pygame.key.get_pressed() if keys is None else keys
         if key[K_UP]:
             if self.jumped and self.vy < 0 and self.vy > -2 * GRAVMAX:
                 self.vy -= 2 * GRAV * dt
@@ -95,8 +95,8 @@ class Bombjack(object):
 
         dy += self.vy * dt
 
-        # Handle platform collisions
-        for p in platList:
+        # Handle platform collisions with the platforms near the move
+        for p in platforms.nearMove(lambda: moveBox(self.x - self.w / 2, self.y, self.w, self.h, dx, dy)):
             if p.get_rect().colliderect(self.x - self.w / 2 + dx, self.y, self.w, self.h):
                 dx = 0
             if p.get_rect().colliderect(self.x - self.w / 2, self.y + dy, self.w, self.h):
@@ -113,28 +113,14 @@ class Bombjack(object):
         self.y += dy
         return score
 
-    def eatCherries(self, cherryList):
-        for cherry in cherryList:
-            if self.collideCheck(cherry):
-                return cherry
-        return None
-
-    def collideCheck(self, other):
-        dx = self.x - other.x
-        dy = self.y - other.y
-        dSquared = dx * dx + dy * dy
-        rSquared = (self.collideRadius + other.collideRadius) ** 2
-        return dSquared <= rSquared
-
     def get_rect(self):
         return pygame.Rect(self.x - self.w / 2, self.y, self.w, self.h)
 
     def render(self, screen):
         if self.image is not None:
+            image = self.image
             if self.poweredUp:
-                copy = self.image.copy()
-                replace_all_colors(copy, (255, 255, 0))
-                self.image = copy
-            screen.blit(self.image, (self.x - self.w, self.y - self.h))
+                image = self.sprites.atlas.getTinted(image, YELLOW)
+            return screen.blit(image, (self.x - self.w, self.y - self.h))
         else:
-            pygame.draw.rect(screen, YELLOW, self.get_rect())
\ No newline at end of file
+            return pygame.draw.rect(screen, YELLOW, self.get_rect())
\ No newline at end of file
@@ -0,0 +1,34 @@
+import os
+import tempfile
+
+"""Module for writing the caches in CACHEDIR.
+
+Every cache is derived from the game's own files and can be rebuilt at any
+time, so writing one is best effort: a cache that cannot be written is
+simply rebuilt on the next launch.
+"""
+
+
+def writeCacheFile(path, write):
+    """
+    Creates the cache file at path by calling write with it open for binary
+    writing, ignoring OS errors.
+
+    The file is written under a temporary name and renamed into place, so a
+    reader never sees a partly written cache, even if the game is killed or
+    another instance writes the same cache at the same time.
+    """
+    try:
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, temp = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path)+'.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                write(f)
+            os.replace(temp, path)
+        finally:
+            if os.path.exists(temp):
+                os.remove(temp)
+    except OSError:
+        # The cache is only an optimization
+        pass
@@ -1,7 +1,8 @@
 import pygame
-from constants import *
 import numpy as np
+from constants import *
 from sprites import CherrySprites
+from leveldata import loadLevel
 
 class Cherry(object):
     """Represents an individual cherry object in the game.
@@ -11,24 +12,25 @@ class Cherry(object):
     (groups) and may be eaten by the player.
 
     Attributes:
-        collideRadius (int): The radius used for collision detection.
+        collideRadius (int): Class-level radius used for collision detection.
+        color (tuple): Class-level RGB color of the cherries.
+        points (int): Class-level number of points awarded for eating a cherry.
         x (int): The horizontal position of the cherry.
         y (int): The vertical position of the cherry.
-        color (tuple): The RGB color of the cherry.
-        points (int): The number of points awarded for eating the cherry.
         visible (bool): Indicates if the cherry is visible on the screen.
         image (:obj:`pygame.Surface`): The image used to render the cherry.
         sprites (:obj:`CherrySprites`): The sprite object for cherry animations.
         isLit (bool): Whether the cherry is "lit" (highlighted or active).
         bunch (int): The bunch ID to which the cherry belongs.
     """
+    __slots__ = ('x', 'y', 'visible', 'image', 'sprites', 'isLit', 'bunch')
+    collideRadius = int(TILEWIDTH * SPRITEFACTOR / 4)
+    color = RED
+    points = 10
 
     def __init__(self, row, column, bunch):
-        self.collideRadius = int(TILEWIDTH * SPRITEFACTOR / 4)
         self.x = column * TILEWIDTH + self.collideRadius
         self.y = row * TILEHEIGHT
-        self.color = RED
-        self.points = 10
         self.visible = True
         self.image = None
         self.sprites = CherrySprites(self)
@@ -40,9 +42,9 @@ class Cherry(object):
 
     def render(self, screen):
         if self.image is not None:
-            screen.blit(self.image, (self.x - 2 * self.collideRadius, self.y - 2 * self.collideRadius))
+            return screen.blit(self.image, (self.x - 2 * self.collideRadius, self.y - 2 * self.collideRadius))
         else:
-            pygame.draw.circle(screen, RED, (self.x, self.y), self.collideRadius)
+            return pygame.draw.circle(screen, self.color, (self.x, self.y), self.collideRadius)
 
 
 class CherryGroup(object):
@@ -57,6 +59,8 @@ class CherryGroup(object):
         numEaten (int): The number of cherries that have been eaten.
         litCount (int): The number of "lit" cherries in the group.
         hasLitCherry (bool): Indicates if there is an active (lit) cherry.
+        circles (numpy.ndarray): The (x, y, collideRadius) of each cherry, in cherryList order,
+            for collision tests. Cherries never move, so it only changes when one is removed.
 
     """
 
@@ -64,6 +68,7 @@ class CherryGroup(object):
         self.cherryList = []
         self.powerup = None
         self.createCherryList(cherryfile)
+        self.circles = self.getCircles()
         self.numEaten = 0
         self.litCount = 0
         self.hasLitCherry = False
@@ -86,29 +91,17 @@ class CherryGroup(object):
         or up-to-down (if the line is vertical). However, if the bunch tag is a symbol rather
         than a number, then the orientation is reversed.
         """
-        data = self.readCherryFile(cherryfile)
-        # Parse the cherries and sort the cherry list using insertion sort
-        for row in range(data.shape[0]):
-            for col in range(data.shape[1]):
-                try:
-                    bunch_tag = data[row][col]
-                    index = '0123456789)!@#$%^&*('.index(bunch_tag)
-                    bunch_number = index % 10
-                    i = 0
-                    # If the bunch tag is a number, keep the order the same as traversed
-                    if index > 9:
-                        while i < len(self.cherryList) and self.cherryList[i].bunch < bunch_number:
-                            i += 1
-                    # If the bunch tag is a symbol, reverse the order relative to traversal
-                    else:
-                        while i < len(self.cherryList) and self.cherryList[i].bunch <= bunch_number:
-                            i += 1
-                    self.cherryList.insert(i, Cherry(row, col, bunch_number))
-                except ValueError:
-                    pass
-
-    def readCherryFile(self, textfile):
-        return np.loadtxt(textfile, dtype='<U1', comments=None)
+        for row, col, bunch in loadLevel(cherryfile).cherries:
+            self.cherryList.append(Cherry(row, col, bunch))
+
+    def getCircles(self):
+        circles = [(cherry.x, cherry.y, cherry.collideRadius) for cherry in self.cherryList]
+        return np.array(circles, dtype=np.float64).reshape(-1, 3)
+
+    def remove(self, cherry):
+        index = self.cherryList.index(cherry)
+        del self.cherryList[index]
+        self.circles = np.delete(self.circles, index, axis=0)
 
     def isEmpty(self):
         return len(self.cherryList) == 0
@@ -125,5 +118,4 @@ class CherryGroup(object):
         self.hasLitCherry = True
 
     def render(self, screen):
-        for cherry in self.cherryList:
-            cherry.render(screen)
+        return [cherry.render(screen) for cherry in self.cherryList]
@@ -1,6 +1,7 @@
 import pygame
 from constants import *
 from sprites import CoinSprites
+from platforms import moveBox
 
 class PowerCoin(object):
     """Represents a power-up coin in the game.
@@ -37,7 +38,7 @@ class PowerCoin(object):
         self.timer = 0
         self.bombjack = bombjack
 
-    def update(self, dt, platList):
+    def update(self, dt, platforms):
         self.sprites.update(dt)
         self.updatePower(dt)
 
@@ -45,8 +46,8 @@ class PowerCoin(object):
         dx = self.vx * dt
         dy = self.vy * dt
 
-        # Check for collisions with platforms and change direction
-        for p in platList:
+        # Check for collisions with the platforms near the move and change direction
+        for p in platforms.nearMove(lambda: moveBox(self.x - self.w / 2, self.y, self.w, self.h, dx, dy)):
             # X-axis collision
             if p.get_rect().colliderect(self.x - self.w / 2 + dx, self.y, self.w, self.h):
                 dx = 0
@@ -73,7 +74,8 @@ class PowerCoin(object):
 
     def render(self, screen):
         if self.visible:
-            screen.blit(self.image, (self.x - self.w, self.y - self.h))
+            return screen.blit(self.image, (self.x - self.w, self.y - self.h))
             # Uncomment to draw debug shapes
             # pygame.draw.rect(screen, YELLOW, self.get_rect(), 3)
             # pygame.draw.circle(screen, RED, (self.x, self.y), self.collideRadius, 3)
+        return None
@@ -0,0 +1,67 @@
+import numpy as np
+
+"""
+Batched collision tests, between moving entities and the level's platforms
+and between Bomb Jack and everything he can touch.
+
+Rects are held as rows of (left, top, right, bottom) edges. Entity positions
+are truncated toward zero the way `pygame.Rect` truncates floats, so every
+test gives exactly the answer `pygame.Rect.colliderect` would.
+"""
+
+
+def rectArray(rects):
+    """
+    Returns an (n, 4) float array of the (left, top, right, bottom) edges of
+    the non-empty pygame rects, which are the only ones anything can hit.
+    """
+    edges = [(rect.left, rect.top, rect.right, rect.bottom) for rect in rects if rect.w > 0 and rect.h > 0]
+    return np.array(edges, dtype=np.float64).reshape(-1, 4)
+
+
+def moveHits(moves, rects):
+    """
+    Tests a batch of proposed moves against platform rects from `rectArray`.
+
+    `moves` is a sequence of (left, top, w, h, dx, dy) rows, one per entity.
+    Each entity is tested moved by dx alone and by dy alone, as the entities'
+    update methods do. Returns the (hitX, hitY) boolean arrays of whether any
+    platform is hit along each axis.
+    """
+    moves = np.array(moves, dtype=np.float64).reshape(-1, 6)
+    n = len(moves)
+    # Row i is entity i moved along x, row n+i the same entity moved along y
+    boxes = np.empty((2*n, 4))
+    boxes[:n, 0] = moves[:, 0]+moves[:, 4]
+    boxes[n:, 0] = moves[:, 0]
+    boxes[:n, 1] = moves[:, 1]
+    boxes[n:, 1] = moves[:, 1]+moves[:, 5]
+    # Truncated like pygame.Rect; whole floats compare exactly with the integer edges
+    np.trunc(boxes[:, :2], out=boxes[:, :2])
+    size = np.trunc(np.concatenate([moves[:, 2:4], moves[:, 2:4]]))
+    boxes[:, 2:] = boxes[:, :2]+size
+    hits = overlapMask(boxes, rects).any(axis=1) & (size > 0).all(axis=1)
+    return hits[:n], hits[n:]
+
+
+def overlapMask(boxes, rects):
+    """
+    Returns an (m, n) mask of which of m boxes overlap which of n rects, both
+    given as (left, top, right, bottom) rows. As with `colliderect`, rects
+    that only touch do not overlap.
+    """
+    mask = boxes[:, 0:1] < rects[:, 2]
+    mask &= rects[:, 0] < boxes[:, 2:3]
+    mask &= boxes[:, 1:2] < rects[:, 3]
+    mask &= rects[:, 1] < boxes[:, 3:4]
+    return mask
+
+
+def circleHits(x, y, radius, circles):
+    """
+    Returns which of the (x, y, radius) rows of `circles` overlap the circle
+    at (x, y): those whose squared distance is at most their squared radii sum.
+    """
+    dx = x - circles[:, 0]
+    dy = y - circles[:, 1]
+    return dx * dx + dy * dy <= (radius + circles[:, 2]) ** 2
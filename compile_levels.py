@@ -0,0 +1,47 @@
+import os
+import re
+import argparse
+from constants import *
+from leveldata import LevelBundle, LevelData, readLevelFile
+
+"""
+Compiles a directory of level text files into one packed level bundle.
+
+Each level is parsed with the same rules the game uses, and stored with its
+merged platform rects, cherries in traversal order, enemy spawn table and
+platform collision index. The game reads the bundle at startup instead of
+parsing the text files, and plays its levels in the order they are compiled,
+by the number in their names. Levels are stored under their paths as given,
+so run this from the game's directory with a relative leveldir.
+
+Usage:
+    python compile_levels.py [leveldir] [-o levels.pack]
+"""
+
+
+def levelNumber(filename):
+    match = re.search(r'(\d+)', filename)
+    return int(match.group(1)) if match else -1
+
+
+def compileLevels(leveldir, output):
+    names = sorted((name for name in os.listdir(leveldir) if name.endswith('.txt')),
+                   key=lambda name: (levelNumber(name), name))
+    levels = {}
+    for name in names:
+        path = os.path.join(leveldir, name)
+        stat = os.stat(path)
+        level = LevelData.parse(readLevelFile(path))
+        levels[path] = (stat.st_mtime_ns, stat.st_size, level)
+        print(f"{name}: {len(level.platforms)} platforms, {len(level.cherries)} cherries, "
+              f"{len(level.enemies)} enemies")
+    LevelBundle(levels).write(output)
+    print(f"Wrote {len(levels)} levels to {output} ({os.path.getsize(output)} bytes)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compile level text files into a packed level bundle.")
+    parser.add_argument('leveldir', nargs='?', default='levels', help="directory of level .txt files")
+    parser.add_argument('-o', '--output', default=LEVELBUNDLE, help="bundle file to write")
+    args = parser.parse_args()
+    compileLevels(args.leveldir, args.output)
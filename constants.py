@@ -15,6 +15,7 @@ SCREENSIZE = (SCREENWIDTH, SCREENHEIGHT-PLATFORMSIZE)
 
 SPRITESHEET_FILE = "spritesheets/spritesheet_bombjack8.png"
 SPRITEFACTOR = 5/3
+# The levels played when there is no level bundle, levels/level0.txt and on
 NUMLEVELS = 5
 NUMLIVES = 5
 
@@ -24,10 +25,15 @@ WHITE = (255, 255, 255)
 RED = (255, 0, 0)
 GREEN = (0, 255, 0)
 BLUE = (0, 0, 255)
+# Colorkey for baked surfaces, never used by the artwork
+MAGENTA = (255, 0, 255)
 
 BOMBJACK = 0
 PCHERRIES = 11
 MUMMYLAPS = 3
+# The size of an enemy's collision rect
+ENEMYWIDTH = TILEWIDTH*SPRITEFACTOR/2
+ENEMYHEIGHT = TILEHEIGHT*SPRITEFACTOR/2-1
 
 GRAV = 400
 GRAVMAX = 800
@@ -45,4 +51,31 @@ RESPAWNTIME = FREEZETIME
 SCORETXT = 0
 ROUNDTXT = 1
 HIGHSCORETXT = 2
+SCORELABELTXT = 3
+ROUNDLABELTXT = 4
+HIGHSCORELABELTXT = 5
 TEXTTIME = .3
+
+# Directory for caches derived from the game's files
+CACHEDIR = ".cache"
+# Whether scaled spritesheets are cached on disk
+ATLASCACHE = True
+# Whether parsed levels are also cached on disk
+LEVELCACHE = True
+# Packed level bundle written by compile_levels.py, used when present
+LEVELBUNDLE = "levels.pack"
+
+MUSICFILE = "ladymadonna.mp3"
+# Whether the music is decoded into memory once instead of streamed from disk
+MUSICPRELOAD = False
+
+# The simulation always advances in steps of this many seconds
+TIMESTEP = 1/30
+# clock.tick measures whole milliseconds, so a frame up to this many seconds short of a step still runs one
+TICKSLACK = 0.001
+# Most steps simulated in one frame to catch up after a slow frame; time beyond that is dropped
+MAXSTEPS = 5
+# Fewest moving enemies whose platform collisions are tested in one NumPy batch
+BATCHCOLLISIONS = 8
+# Whether enemy groups keep chasing enemies in NumPy arrays, for levels with hundreds of enemies
+ENEMYARRAYS = False
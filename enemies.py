@@ -3,8 +3,10 @@ import numpy as np
 from pygame.locals import *
 from constants import *
 from math import sqrt
+from leveldata import loadLevel
+from collisions import moveHits
+from enemyarrays import ClubArrays, BirdArrays, UFOArrays, OrbArrays, SphereArrays
 from sprites import Spritesheet, MummySprites, BirdSprites, ClubSprites, UFOSprites, OrbSprites, SphereSprites
-from replace_color import replace_color
 
 
 class Enemy(object):
@@ -20,7 +22,10 @@ class Enemy(object):
         bombjack (object): Reference to the player character, Bomb Jack.
         image (pygame.Surface): The current image of the enemy.
         sprites (Sprites): Sprites used for animations.
-        collideRadius (float): Radius used for collision detection.
+        collideRadius (float): Class-level radius used for collision detection.
+        x, y (float): The position of the enemy.
+        vx, vy (float): The velocity of the enemy.
+        direction (float): The direction the enemy faces or moves in, which subclasses interpret.
         frozen (bool): Flag indicating whether the enemy is frozen.
         freezeTimer (float): Timer for tracking the freeze state.
         flashTimer (float): Timer for the flashing effect while frozen.
@@ -30,15 +35,22 @@ class Enemy(object):
         safeImage (pygame.Surface): The image displayed when the enemy is in the friendly state.
         visible (bool): Flag indicating whether the enemy is visible (used during flashing).
         v (int): Velocity of the enemy.
+        tile (int): The tile of the flow field the enemy last steered from, or -1.
     """
+    __slots__ = ('w', 'h', 'x', 'y', 'vx', 'vy', 'v', 'direction', 'timer', 'bombjack', 'image', 'sprites',
+                 'frozen', 'freezeTimer', 'flashTimer', 'flashTime', 'safeTimer', 'friendly', 'safeImage',
+                 'visible', 'tile')
+    collideRadius = TILEWIDTH/2
+    # Whether the enemy's moves are tested against the platforms
+    collides = True
+
     def __init__(self, bombjack):
-        self.w = TILEWIDTH*SPRITEFACTOR/2
-        self.h = TILEHEIGHT*SPRITEFACTOR/2-1
+        self.w = ENEMYWIDTH
+        self.h = ENEMYHEIGHT
         self.timer = 0
         self.bombjack = bombjack
         self.image = None
         self.sprites = MummySprites(self)
-        self.collideRadius = TILEWIDTH/2
         self.frozen = False
         self.freezeTimer = 0
         self.flashTimer = 0
@@ -48,6 +60,7 @@ class Enemy(object):
         self.safeImage = self.sprites.getStartImage()
         self.visible = True
         self.v = 100
+        self.tile = -1
 
     def freeze(self):
         """
@@ -86,25 +99,57 @@ class Enemy(object):
     def get_rect(self):
         return pygame.Rect(self.x-self.w/2, self.y-3*self.h/5, self.w, self.h)
 
+    def propose(self, dt, field):
+        """
+        Updates the enemy's timers and animation, and returns the (dx, dy) it
+        wants to move by, or None while it is frozen or friendly and stays put.
+        Chasers steer by `field`, the level's `FlowField`.
+
+        The move is then tested against the platforms (see `EnemyGroup.update`)
+        and finished by `resolve`, which subclasses define along with `getMove`.
+        """
+        if self.frozen:
+            self.updateFreeze(dt)
+            return None
+        if self.friendly:
+            self.updateSafe(dt)
+            return None
+        self.sprites.update(dt)
+        return self.getMove(dt, field)
+
+    def getTile(self, field):
+        """Returns the flow field tile the middle of the enemy's rect is in."""
+        return field.tileAt(self.x, self.y+self.h/2)
+
+    def getAim(self, field, tile):
+        """
+        Returns the (diffx, diffy) from the enemy to where it should head from
+        tile: the field's next waypoint, or Bomb Jack when there is none.
+        """
+        waypoint = field.waypoints[tile]
+        if waypoint is None:
+            return self.bombjack.x-self.x, self.bombjack.y-self.y
+        return waypoint[0]-self.x, waypoint[1]-(self.y+self.h/2)
+
     def render(self, screen):
         if not self.visible:
-            return
+            return None
         if self.image is not None:
             y_shifted = self.get_rect().y
-            screen.blit(self.image, (self.x-self.w, y_shifted))
+            return screen.blit(self.image, (self.x-self.w, y_shifted))
             # pygame.draw.rect(screen, YELLOW, self.get_rect(), 3)
             # pygame.draw.circle(screen, RED, (self.x, self.y), self.collideRadius, 3)
         else:
-            pygame.draw.rect(screen, YELLOW, self.get_rect())
+            return pygame.draw.rect(screen, YELLOW, self.get_rect())
     
-    def collidingWithPlatform(self, rectangle, platList):
+    def collidingWithPlatform(self, rectangle, platforms):
         """
         Returns true iff the enemy is colliding with a platform
 
         Args:
-            platList (:obj:`Platform`): List of platforms in the current level
+            platforms (:obj:`PlatformGroup`): The platforms in the current level
         """
-        for p in platList:
+        for p in platforms.near(rectangle):
             if p.get_rect().colliderect(rectangle):
                 return True
         return False
@@ -121,11 +166,15 @@ class EnemyGroup(object):
         respawnTimer (float): Timer for respawning enemies.
         row (int): Spawn row location for new enemies.
         col (int): Spawn column location for new enemies.
+        arrays (bool): Whether Clubs, Birds, UFOs, Orbs and Spheres are updated as arrays (see enemyarrays.py).
+        stores (dict): Maps each of those kinds to the `EnemyArrays` holding its enemies, when `arrays` is set.
     """
-    def __init__(self, enemyfile, bombjack):
+    def __init__(self, enemyfile, bombjack, arrays=ENEMYARRAYS):
         self.enemyList = []
         self.respawnList = []
         self.bombjack = bombjack
+        self.arrays = arrays
+        self.stores = {}
         self.createEnemyList(enemyfile)
         self.respawnTimer = RESPAWNTIME
         # The spawn location
@@ -146,59 +195,138 @@ class EnemyGroup(object):
             - p : Sphere
             - o : Orb
         """
-        data = self.readEnemyFile(enemyfile)
-        for row in range(data.shape[0]):
-            for col in range(data.shape[1]):
-                # Mummy spawner
-                if data[row][col] == 's':
-                    self.row = row
-                    self.col = col
-                # Bird
-                elif data[row][col] == 'b':
-                    self.enemyList.append(Bird(self.bombjack, row, col))
-                # Club
-                if data[row][col] == 'c':
-                    mummy = Mummy(self.bombjack, self.row, self.col, None)
-                    mummy.next = Club(self.bombjack, -1, -1, mummy)
-                    self.respawnList.append(mummy)
-                # UFO
-                elif data[row][col] == 'u':
-                    mummy = Mummy(self.bombjack, self.row, self.col, None)
-                    mummy.next = UFO(self.bombjack, -1, -1, mummy)
-                    self.respawnList.append(mummy)
-                # Sphere
-                elif data[row][col] == 'p':
-                    mummy = Mummy(self.bombjack, self.row, self.col, None)
-                    mummy.next = Sphere(self.bombjack, -1, -1, mummy)
-                    self.respawnList.append(mummy)
-                # Orb
-                elif data[row][col] == 'o':
-                    mummy = Mummy(self.bombjack, self.row, self.col, None)
-                    mummy.next = Orb(self.bombjack, -1, -1, mummy)
-                    self.respawnList.append(mummy)
-
-    def readEnemyFile(self, textfile):
-        return np.loadtxt(textfile, dtype='<U1', comments=None)
+        level = loadLevel(enemyfile)
+        for symbol, row, col, spawnRow, spawnCol in level.enemies:
+            # Bird
+            if symbol == 'b':
+                self.enemyList.append(Bird(self.bombjack, row, col))
+                continue
+            mummy = Mummy(self.bombjack, spawnRow, spawnCol, None)
+            # Club
+            if symbol == 'c':
+                mummy.next = Club(self.bombjack, -1, -1, mummy)
+            # UFO
+            elif symbol == 'u':
+                mummy.next = UFO(self.bombjack, -1, -1, mummy)
+            # Sphere
+            elif symbol == 'p':
+                mummy.next = Sphere(self.bombjack, -1, -1, mummy)
+            # Orb
+            elif symbol == 'o':
+                mummy.next = Orb(self.bombjack, -1, -1, mummy)
+            self.respawnList.append(mummy)
 
     def isEmpty(self):
         if len(self.enemyList) == 0:
             return True
         return False
 
-    def update(self, dt, platList):
+    def update(self, dt, platforms):
+        """
+        Updates every enemy, testing all their moves against the platforms in one batch.
+
+        Enemies only collide with platforms, so proposing every move first and
+        resolving them afterwards gives the same result as updating them in turn.
+        Mummies follow the walkable spans instead, so they are resolved at once.
+        Below BATCHCOLLISIONS moving enemies, the fixed cost of the array
+        operations outweighs the grid queries, so each move is tested on its own.
+        """
         self.updateRespawn(dt)
+        platforms.flowField.retarget(self.bombjack)
+        if self.arrays:
+            self.updateArrays(dt, platforms)
+            return
+        moving = []
+        moves = []
         for enemy in self.enemyList:
-            enemy.update(dt, platList)
+            move = enemy.propose(dt, platforms.flowField)
+            if move is None:
+                continue
+            if not enemy.collides:
+                enemy.resolve(dt, move[0], move[1], False, False, platforms)
+            else:
+                moving.append(enemy)
+                moves.append((enemy.x-enemy.w/2, enemy.y, enemy.w, enemy.h) + tuple(move))
+        if len(moving) >= BATCHCOLLISIONS:
+            hitsX, hitsY = moveHits(moves, platforms.rects)
+            hitsX, hitsY = hitsX.tolist(), hitsY.tolist()
+        else:
+            hitsX = [enemy.collidingWithPlatform(pygame.Rect(left + dx, top, w, h), platforms)
+                     for enemy, (left, top, w, h, dx, dy) in zip(moving, moves)]
+            hitsY = [enemy.collidingWithPlatform(pygame.Rect(left, top + dy, w, h), platforms)
+                     for enemy, (left, top, w, h, dx, dy) in zip(moving, moves)]
+        for enemy, move, hitX, hitY in zip(moving, moves, hitsX, hitsY):
+            enemy.resolve(dt, move[4], move[5], hitX, hitY, platforms)
+
+    def updateArrays(self, dt, platforms):
+        """
+        Updates the kinds with an `EnemyArrays` store in batch, and the others
+        (mummies) one object at a time, then tests the moves of all those that
+        collide at once.
+        """
+        members = {}
+        objects = []
+        for enemy in self.enemyList:
+            if type(enemy) in ARRAYKINDS:
+                members.setdefault(type(enemy), []).append(enemy)
+            else:
+                objects.append(enemy)
+        for kind in list(self.stores):
+            if kind not in members:
+                self.stores.pop(kind).flush()
+        stores = []
+        for kind, enemies in members.items():
+            store = self.stores.get(kind)
+            # Enemies joined or left since the store was built
+            if store is None or store.objects != enemies:
+                if store is not None:
+                    store.flush()
+                store = self.stores[kind] = ARRAYKINDS[kind](enemies)
+            store.propose(dt, self.bombjack, platforms.flowField)
+            stores.append(store)
+
+        moving = []
+        moves = []
+        for enemy in objects:
+            move = enemy.propose(dt, platforms.flowField)
+            if move is None:
+                continue
+            if not enemy.collides:
+                enemy.resolve(dt, move[0], move[1], False, False, platforms)
+            else:
+                moving.append(enemy)
+                moves.append((enemy.x-enemy.w/2, enemy.y, enemy.w, enemy.h) + tuple(move))
+        batch = [np.array(moves, dtype=np.float64).reshape(-1, 6)] + [store.getMoves() for store in stores]
+        hitsX, hitsY = moveHits(np.concatenate(batch), platforms.rects)
+        for enemy, move, hitX, hitY in zip(moving, moves, hitsX.tolist(), hitsY.tolist()):
+            enemy.resolve(dt, move[4], move[5], hitX, hitY, platforms)
+        start = len(moving)
+        for store in stores:
+            end = start+len(store.moving)
+            store.resolve(dt, hitsX[start:end], hitsY[start:end], self.bombjack)
+            start = end
+
+    def flush(self):
+        """Writes the array stores back to the enemies, before they are changed from outside."""
+        for store in self.stores.values():
+            store.flush()
+        self.stores.clear()
 
     def render(self, screen):
+        rects = []
         for enemy in self.enemyList:
-            enemy.render(screen)
+            rect = enemy.render(screen)
+            if rect is not None:
+                rects.append(rect)
+        return rects
 
     def freeze(self):
+        self.flush()
         for enemy in self.enemyList:
             enemy.freeze()
 
     def respawn(self, enemy):
+        self.flush()
         enemy.frozen = False
         enemy.friendly = False
         enemy.freezeTimer = 0
@@ -225,58 +353,64 @@ class EnemyGroup(object):
 
 
 class Mummy(Enemy):
-    def __init__(self, bombjack, row, col, next, platform=None):
+    """
+    The enemy that spawns the others. A mummy walks back and forth along a
+    span (see `PlatformGroup.buildSpans`), turning at its ends and at walls,
+    and after MUMMYLAPS turns walks off its right end and drops onto the span
+    below. Once it reaches the bottom of the level it turns into its next
+    enemy.
+
+    Attributes:
+        row (int): The spawn row.
+        col (int): The spawn column.
+        span (WalkSpan): The span the mummy walks along or last walked along, None until it first lands.
+        target (WalkSpan): The span the mummy is falling onto, once looked up.
+        falling (bool): Whether the mummy is falling.
+        next (Enemy): The enemy the mummy turns into.
+        numLaps (int): The number of times the mummy has turned on its span.
+    """
+    __slots__ = ('row', 'col', 'span', 'target', 'falling', 'next', 'numLaps')
+    # Mummies follow the walkable spans, so their moves are not tested against the platforms
+    collides = False
+
+    def __init__(self, bombjack, row, col, next):
         Enemy.__init__(self, bombjack)
         self.row = row
         self.col = col
         self.x = col*TILEWIDTH
         self.y = row*TILEHEIGHT
+        # Set before the slower speed below, so the first falling frame still drifts a little
         self.vx = self.v
         self.vy = 0
-        self.platform = platform
+        self.span = None
+        self.target = None
+        self.falling = True
         self.sprites = MummySprites(self)
         self.image = self.sprites.getImage(0, 1)
         self.direction = 1
         self.next = next
         self.numLaps = 0
-        self.safeImage = self.sprites.getImage(2, 8)
+        self.safeImage = self.sprites.getSafeImage()
         # Mummys are slow
         self.v = 50
 
-        # Color shifting the poof to blue
-        sheet = pygame.image.load(
-            "spritesheets/spritesheet_bombjack8.png").convert()
-        replace = sheet.get_at((49, 171))
-        new = (0, 0, 255)
-        replace_color(self.safeImage, replace, new)
-        replace = sheet.get_at((41, 171))
-        new = (255, 255, 255)
-        replace_color(self.safeImage, replace, new)
-        replace = sheet.get_at((42, 171))
-        new = (255, 0, 0)
-        replace_color(self.safeImage, replace, new)
-
     def get_rect(self):
         return pygame.Rect(self.x-self.w/2, self.y-self.h, self.w, self.h)
 
-    def update(self, dt, platList):
-        if self.frozen:
-            self.updateFreeze(dt)
-            return
-        if self.friendly:
-            self.updateSafe(dt)
-            return
-        self.sprites.update(dt)
-        dx = 0
-        dy = 0
-
+    def getMove(self, dt, field):
         dx = self.vx*dt
+        dy = 0
 
-        p = self.platform
+        span = self.span
         # Used for x-collision detection
         margin = 1
+        # Step off the end once done with the laps, or off the start once almost past it
+        if not self.falling and (self.numLaps >= MUMMYLAPS and self.x+dx+margin > span.end
+                                 or self.x+dx+self.w < span.start+margin):
+            self.falling = True
+            self.target = None
         # If falling
-        if p is None or self.numLaps >= MUMMYLAPS and self.x+dx+margin > p.x+p.w or self.x+dx+self.w < p.x+margin:
+        if self.falling:
             self.vx = 0
             # Add gravity
             self.vy += GRAV*dt
@@ -286,35 +420,48 @@ class Mummy(Enemy):
             dy += self.vy*dt
             # Set image to falling image
             self.image = self.sprites.getImage(1, 1)
-        # If walking on the platform
+        # If walking on the span
         elif self.numLaps < MUMMYLAPS:
-            if self.x+dx+self.w > p.x+p.w or self.x+dx < p.x:
-                self.vx *= -1
-                self.direction *= -1
-                self.numLaps += 1
-                dx = self.vx*dt
-
-        for plat in platList:
-            # Vertical collision
-            if plat is not self.platform and plat.get_rect().colliderect(self.x-self.w/2, self.y+dy, self.w, self.h):
-                self.vy = 0
+            if self.x+dx+self.w > span.end or self.x+dx < span.start:
+                dx = self.turn(dt)
+        # Turn at the walls of the span, even on the frame the mummy steps off it
+        if span is not None and self.y == span.top-self.h:
+            left = int(self.x-self.w/2+dx)
+            if span.hitsWall(left, left+int(self.w)):
+                dx = self.turn(dt)
+        return dx, dy
+
+    def turn(self, dt):
+        """Turns the mummy around, counting a lap, and returns its new move."""
+        self.vx *= -1
+        self.direction *= -1
+        self.numLaps += 1
+        return self.vx*dt
+
+    def resolve(self, dt, dx, dy, hitX, hitY, platforms):
+        if self.falling:
+            if self.target is None:
+                # Look up the span below where the mummy spawned or stepped off its span
+                self.target = platforms.landing(self.x+dx, self.y, self.span)
+            target = self.target
+            # Land once its rect, truncated like pygame.Rect, reaches the platform
+            if target is not None and int(self.y+dy)+int(self.h) > target.platform.rect.top:
+                self.land(target)
                 dy = 0
-                self.vx = self.v
-                self.direction = 1
-                self.numLaps = 0
-                self.platform = plat
-                # Perfectly align the mummy vertically
-                self.y = plat.y-self.h
-            # Horizontal collision
-            if plat.get_rect().colliderect(self.x-self.w/2+dx, self.y, self.w, self.h):
-                self.vx *= -1
-                self.direction *= -1
-                self.numLaps += 1
-                dx = self.vx*dt
-
         self.x += dx
         self.y += dy
 
+    def land(self, span):
+        self.span = span
+        self.target = None
+        self.falling = False
+        self.vy = 0
+        self.vx = self.v
+        self.direction = 1
+        self.numLaps = 0
+        # Perfectly align the mummy vertically
+        self.y = span.top-self.h
+
     def get_next(self, x, y):
         self.next.x = x
         self.next.y = y
@@ -324,6 +471,8 @@ class Mummy(Enemy):
 
 
 class Club(Enemy):
+    __slots__ = ('mummy', 'time')
+
     def __init__(self, bombjack, x, y, mummy):
         Enemy.__init__(self, bombjack)
         self.mummy = mummy
@@ -337,39 +486,34 @@ class Club(Enemy):
         self.timer = 0
         self.time = .5
 
-    def update(self, dt, platList):
-        if self.frozen:
-            self.updateFreeze(dt)
-            return
-        if self.friendly:
-            self.updateSafe(dt)
-            return
-        self.sprites.update(dt)
+    def getMove(self, dt, field):
         dx = 0
         dy = 0
 
         self.timer += dt
-        if self.timer > self.time:
-            diffx = self.bombjack.x-self.x
-            diffy = self.bombjack.y-self.y
+        tile = self.getTile(field)
+        # Aim again every so often, and wherever the path may turn
+        if self.timer > self.time or tile != self.tile:
+            diffx, diffy = self.getAim(field, tile)
             dist = sqrt(diffx*diffx+diffy*diffy)
 
             self.vx = self.v*diffx/dist*dt
             self.vy = self.v*diffy/dist*dt
             self.direction = diffx
             self.timer = 0
+            self.tile = tile
         dx += self.vx
         dy += self.vy
+        return dx, dy
 
-        movedRectangleX = pygame.Rect(self.x-self.w/2 + dx, self.y, self.w, self.h)
-        movedRectangleY = pygame.Rect(self.x-self.w/2, self.y + dy, self.w, self.h)
+    def resolve(self, dt, dx, dy, hitX, hitY, platforms):
         # check for collision in x direction
-        if self.collidingWithPlatform(movedRectangleX, platList):
+        if hitX:
             self.direction *= -1
             self.vx *= -1
             self.timer = 0
         # check for collision in y direction
-        if self.collidingWithPlatform(movedRectangleY, platList):
+        if hitY:
             self.vy *= -1
             self.timer = 0
 
@@ -378,6 +522,8 @@ class Club(Enemy):
 
 
 class Bird(Enemy):
+    __slots__ = ('time',)
+
     def __init__(self, bombjack, row, col):
         Enemy.__init__(self, bombjack)
         self.x = col*TILEWIDTH
@@ -391,42 +537,71 @@ class Bird(Enemy):
         self.image = self.sprites.getImage(8, 1)
 
     # We need to make him go in one direction for longer to avoid diagonal "cheating"
-    def update(self, dt, platList):
-        if self.frozen:
-            self.updateFreeze(dt)
-            return
-        if self.friendly:
-            self.updateSafe(dt)
-            return
-        self.sprites.update(dt)
+    def getMove(self, dt, field):
         dx = 0
         dy = 0
         self.timer += dt
+        tile = self.getTile(field)
         if self.timer >= self.time:
             self.vx = 0
             self.vy = 0
             self.direction = 0
             if self.timer >= 1.5*self.time:
-                diffx = self.bombjack.x-self.x
-                diffy = self.bombjack.y-self.y
-
-                if abs(diffx) > abs(diffy):
-                    self.direction = diffx/abs(diffx)
-                    self.vx = self.v*self.direction
-                else:
-                    self.direction = 2*diffy/abs(diffy)
-                    self.vy = self.v*(self.direction/2)
+                self.aim(field, tile)
                 self.timer = 0
+        # Turn where the path does, in the middle of each new tile
+        elif self.direction != 0 and tile != self.tile:
+            cx, cy = field.getCenter(tile)
+            if abs(self.direction) == 1:
+                ahead = (cx-self.x)*self.direction
+                if 0 <= ahead <= self.v*dt:
+                    self.x = cx
+                    self.turn(field, tile)
+            else:
+                ahead = (cy-(self.y+self.h/2))*self.direction/2
+                if 0 <= ahead <= self.v*dt:
+                    self.y = cy-self.h/2
+                    self.turn(field, tile)
 
         dx = self.vx*dt
         dy = self.vy*dt
+        return dx, dy
+
+    def turn(self, field, tile):
+        self.vx = 0
+        self.vy = 0
+        self.aim(field, tile)
+
+    def aim(self, field, tile):
+        """
+        Heads along the axis of the way on from tile. A bird off the line the
+        way follows first heads for the middle of the tile, and turns there.
+        """
+        waypoint = field.waypoints[tile]
+        cx, cy = field.getCenter(tile)
+        self.tile = -1
+        if waypoint is None:
+            diffx, diffy = self.getAim(field, tile)
+            self.tile = tile
+        elif waypoint[1] == cy and abs(cy-(self.y+self.h/2)) >= 1:
+            diffx, diffy = 0, cy-(self.y+self.h/2)
+        elif waypoint[0] == cx and abs(cx-self.x) >= 1:
+            diffx, diffy = cx-self.x, 0
+        else:
+            diffx, diffy = waypoint[0]-cx, waypoint[1]-cy
+            self.tile = tile
+        if abs(diffx) > abs(diffy):
+            self.direction = diffx/abs(diffx)
+            self.vx = self.v*self.direction
+        else:
+            self.direction = 2*diffy/abs(diffy)
+            self.vy = self.v*(self.direction/2)
 
-        movedRectangleX = pygame.Rect(self.x-self.w/2 + dx, self.y, self.w, self.h)
-        movedRectangleY = pygame.Rect(self.x-self.w/2, self.y + dy, self.w, self.h)
+    def resolve(self, dt, dx, dy, hitX, hitY, platforms):
         # check for collision in x direction
-        if self.collidingWithPlatform(movedRectangleX, platList):
+        if hitX:
             dx = 0
-        if self.collidingWithPlatform(movedRectangleY, platList):
+        if hitY:
             dy = 0
 
         self.x += dx
@@ -434,6 +609,8 @@ class Bird(Enemy):
 
 
 class UFO(Enemy):
+    __slots__ = ('mummy',)
+
     def __init__(self, bombjack, x, y, mummy):
         Enemy.__init__(self, bombjack)
         self.mummy = mummy
@@ -461,23 +638,31 @@ class UFO(Enemy):
         self.vx = self.v*diffx/dist
         self.vy = self.v*diffy/dist
 
-    def update(self, dt, platList):
-        if self.frozen:
-            self.updateFreeze(dt)
-            return
-        if self.friendly:
-            self.updateSafe(dt)
-            return
-        self.sprites.update(dt)
+    def steer(self, field, tile):
+        """Heads along the field, as fast as `setVelocity` would go."""
+        diffx, diffy = self.getAim(field, tile)
+        dist = sqrt(diffx*diffx+diffy*diffy)
+        if dist > 0:
+            bx = self.bombjack.x-self.x
+            by = self.bombjack.y-self.y
+            self.v = sqrt(bx*bx+by*by)
+            self.vx = self.v*diffx/dist
+            self.vy = self.v*diffy/dist
+        self.tile = tile
+
+    def getMove(self, dt, field):
+        tile = self.getTile(field)
+        if tile != self.tile:
+            self.steer(field, tile)
         dx = self.vx*dt
         dy = self.vy*dt
+        return dx, dy
 
-        movedRectangleX = pygame.Rect(self.x-self.w/2 + dx, self.y, self.w, self.h)
-        movedRectangleY = pygame.Rect(self.x-self.w/2, self.y + dy, self.w, self.h)
+    def resolve(self, dt, dx, dy, hitX, hitY, platforms):
         # check for collision in x direction
-        if self.collidingWithPlatform(movedRectangleX, platList):
+        if hitX:
             self.setVelocity(dx, 0)
-        if self.collidingWithPlatform(movedRectangleY, platList):
+        if hitY:
             self.setVelocity(0, dy)
 
         dx = self.vx*dt
@@ -488,6 +673,8 @@ class UFO(Enemy):
 
 
 class Orb(Enemy):
+    __slots__ = ('mummy', 'time')
+
     def __init__(self, bombjack, x, y, mummy):
         Enemy.__init__(self, bombjack)
         self.mummy = mummy
@@ -502,14 +689,7 @@ class Orb(Enemy):
         self.timer = 0
         self.time = 1
 
-    def update(self, dt, platList):
-        if self.frozen:
-            self.updateFreeze(dt)
-            return
-        if self.friendly:
-            self.updateSafe(dt)
-            return
-        self.sprites.update(dt)
+    def getMove(self, dt, field):
         dx = 0
         dy = 0
 
@@ -522,15 +702,15 @@ class Orb(Enemy):
 
         dx += self.vx
         dy += self.vy
+        return dx, dy
 
-        movedRectangleX = pygame.Rect(self.x-self.w/2 + dx, self.y, self.w, self.h)
-        movedRectangleY = pygame.Rect(self.x-self.w/2, self.y + dy, self.w, self.h)
+    def resolve(self, dt, dx, dy, hitX, hitY, platforms):
         # check for collision in x direction
-        if self.collidingWithPlatform(movedRectangleX, platList):
+        if hitX:
             self.direction *= -1
             self.vx *= -1
         # check for collision in y direction
-        if self.collidingWithPlatform(movedRectangleY, platList):
+        if hitY:
             self.vy *= -1
             self.timer = 0
 
@@ -539,6 +719,8 @@ class Orb(Enemy):
 
 
 class Sphere(Enemy):
+    __slots__ = ('mummy', 'time')
+
     def __init__(self, bombjack, x, y, mummy):
         Enemy.__init__(self, bombjack)
         self.mummy = mummy
@@ -553,14 +735,7 @@ class Sphere(Enemy):
         self.timer = 0
         self.time = 2/30
 
-    def update(self, dt, platList):
-        if self.frozen:
-            self.updateFreeze(dt)
-            return
-        if self.friendly:
-            self.updateSafe(dt)
-            return
-        self.sprites.update(dt)
+    def getMove(self, dt, field):
         dx = 0
         dy = 0
 
@@ -573,18 +748,22 @@ class Sphere(Enemy):
 
         dx += self.vx
         dy += self.vy
-        
-        movedRectangleX = pygame.Rect(self.x-self.w/2 + dx, self.y, self.w, self.h)
-        movedRectangleY = pygame.Rect(self.x-self.w/2, self.y + dy, self.w, self.h)
+        return dx, dy
+
+    def resolve(self, dt, dx, dy, hitX, hitY, platforms):
         # check for collision in x direction
-        if self.collidingWithPlatform(movedRectangleX, platList):
+        if hitX:
             self.vx *= -1
             self.timer = 0
         # check for collision in y direction
-        if self.collidingWithPlatform(movedRectangleY, platList):
+        if hitY:
             self.direction *= -1
             self.vy *= -1
             self.timer = 0
 
         self.x += dx
         self.y += dy
+
+
+# The kinds EnemyGroup can update as arrays, and their stores
+ARRAYKINDS = {Club: ClubArrays, Bird: BirdArrays, UFO: UFOArrays, Orb: OrbArrays, Sphere: SphereArrays}
@@ -0,0 +1,379 @@
+import numpy as np
+from constants import *
+
+"""
+Structure-of-arrays storage for the enemies that chase Bomb Jack.
+
+With `EnemyGroup(..., arrays=True)`, the positions, velocities and timers of
+every Club, Bird, UFO, Orb and Sphere are kept in one NumPy array per field
+and kind, and steering, the freeze, flash and safe timers, and movement are
+computed for all enemies of a kind at once, with chasers reading the flow
+field for all their tiles at once. Each kind repeats the
+arithmetic of its class's `getMove` and `resolve` in the same order, so the
+results are identical to updating the objects one by one.
+
+The arrays are authoritative while a store exists, including the state of
+each enemy's sprite animators, which are stepped here the way the kind's
+sprites class steps them. After each update the fields the rest of the game
+reads (position, image and the frozen, friendly and visible flags) are
+written back to the enemy objects. `flush` writes back everything, and is
+called before anything outside the store changes an enemy; the group then
+builds a new store from the objects on its next update.
+"""
+
+
+class EnemyArrays(object):
+    """The enemies of one kind, as arrays.
+
+    Each kind defines `getMove(dt, bombjack, i, field)`, which returns the
+    (dx, dy) arrays of the rows i, and `resolveMove(dt, i, dx, dy, hitX, hitY,
+    bombjack)`, which finishes those moves given the platform hits and returns
+    the moves made, as its class's `getMove` and `resolve` do.
+
+    Attributes:
+        objects (list): The enemy objects, in enemyList order; row i of every array is objects[i].
+        x, y, vx, vy, v, timer, time, direction, w, h, tile (numpy.ndarray): Float fields, as on `Enemy`.
+        frozen, friendly, visible (numpy.ndarray): Boolean flags, as on `Enemy`.
+        freezeTimer, flashTimer, flashTime, safeTimer (numpy.ndarray): The freeze, flash and safe timers.
+        frames (dict): Maps each animation name to the array of every enemy's current frame.
+        frameTimers (dict): Maps each animation name to the array of every enemy's time since its last frame.
+        images (list): The frame images of the kind, as returned by `getImages`.
+        moving (numpy.ndarray): Indices of the enemies moving in the current update.
+        dx, dy (numpy.ndarray): The moves of the moving enemies.
+    """
+    floatFields = ('x', 'y', 'vx', 'vy', 'v', 'timer', 'time', 'direction', 'w', 'h', 'tile',
+                   'freezeTimer', 'flashTimer', 'flashTime', 'safeTimer')
+    boolFields = ('frozen', 'friendly', 'visible')
+    # Fields that never change, so they are not written back
+    constantFields = ('time', 'w', 'h')
+    # The sprite animations this kind steps, and whether it mirrors them when moving right
+    animations = ('MOVE',)
+    mirrored = True
+
+    def __init__(self, objects):
+        self.objects = list(objects)
+        for name in self.floatFields:
+            setattr(self, name, np.array([getattr(enemy, name, 0) for enemy in self.objects], dtype=np.float64))
+        for name in self.boolFields:
+            setattr(self, name, np.array([getattr(enemy, name) for enemy in self.objects], dtype=bool))
+        self.frames = {}
+        self.frameTimers = {}
+        for name in self.animations:
+            animators = [enemy.sprites.animations[name] for enemy in self.objects]
+            self.frames[name] = np.array([animator.current_frame for animator in animators], dtype=np.intp)
+            self.frameTimers[name] = np.array([animator.dt for animator in animators], dtype=np.float64)
+        self.images = self.getImages(self.objects[0].sprites) if self.objects else []
+        self.moving = np.zeros(0, dtype=np.intp)
+        self.dx = np.zeros(0)
+        self.dy = np.zeros(0)
+
+    def flush(self):
+        """Writes every field back to the enemy objects."""
+        for name in self.floatFields + self.boolFields:
+            if name in self.constantFields:
+                continue
+            for enemy, value in zip(self.objects, getattr(self, name).tolist()):
+                setattr(enemy, name, value)
+        for name in self.animations:
+            for enemy, frame, frameTimer in zip(self.objects, self.frames[name].tolist(),
+                                                self.frameTimers[name].tolist()):
+                animator = enemy.sprites.animations[name]
+                animator.current_frame = frame
+                animator.dt = frameTimer
+
+    def getImages(self, sprites):
+        """
+        Returns the images of the kind's animation frames: for each animation
+        in order, its frames, followed by their mirrored images if the kind
+        mirrors them.
+        """
+        images = []
+        for name in self.animations:
+            frames = sprites.animations[name].frames
+            images += [sprites.getImage(*frame) for frame in frames]
+            if self.mirrored:
+                images += [sprites.getFlippedImage(*frame) for frame in frames]
+        return images
+
+    def stepAnimation(self, name, dt, i):
+        """Steps animation `name` of the enemies in rows i like `Animator.update`, and returns their frames."""
+        animator = self.objects[0].sprites.animations[name]
+        self.frameTimers[name][i] += dt
+        advanced = i[self.frameTimers[name][i] >= (1.0 / animator.speed)]
+        self.frames[name][advanced] += 1
+        self.frameTimers[name][advanced] = 0
+        frames = self.frames[name][i]
+        frames[frames == len(animator.frames)] = 0
+        self.frames[name][i] = frames
+        return frames
+
+    def animate(self, dt, i):
+        """Steps the animation of the enemies in rows i and sets their images, as their sprites' update does."""
+        codes = self.stepAnimation('MOVE', dt, i)
+        if self.mirrored:
+            codes = codes + np.where(self.direction[i] > 0, len(self.images)//2, 0)
+        self.setImages(i, codes)
+
+    def setImages(self, i, codes):
+        images = self.images
+        for row, code in zip(i.tolist(), codes.tolist()):
+            self.objects[row].image = images[code]
+
+    def writeFlags(self, rows):
+        for i in rows.tolist():
+            enemy = self.objects[i]
+            enemy.frozen = bool(self.frozen[i])
+            enemy.friendly = bool(self.friendly[i])
+            enemy.visible = bool(self.visible[i])
+
+    def propose(self, dt, bombjack, field):
+        """
+        Runs the timers and animation of every enemy, then computes the moves
+        of those that are neither frozen nor friendly into `moving`, `dx` and `dy`.
+        """
+        frozen = np.flatnonzero(self.frozen)
+        friendly = np.flatnonzero(self.friendly & ~self.frozen)
+        moving = np.flatnonzero(~self.frozen & ~self.friendly)
+        if len(frozen):
+            self.updateFreeze(dt, frozen)
+        if len(friendly):
+            self.updateSafe(dt, friendly)
+        if len(moving):
+            self.animate(dt, moving)
+        self.moving = moving
+        self.dx, self.dy = self.getMove(dt, bombjack, moving, field)
+
+    def getMoves(self):
+        """Returns the (left, top, w, h, dx, dy) rows of the moving enemies, for `collisions.moveHits`."""
+        i = self.moving
+        return np.stack([self.x[i]-self.w[i]/2, self.y[i], self.w[i], self.h[i], self.dx, self.dy], axis=-1)
+
+    def updateFreeze(self, dt, i):
+        self.freezeTimer[i] += dt
+        flashing = i[FREEZETIME - self.freezeTimer[i] <= NUMFLASHES*FLASHTIME]
+        self.flashTimer[flashing] += dt
+        flash = i[self.flashTimer[i] >= self.flashTime[i]]
+        self.visible[flash] = ~self.visible[flash]
+        self.flashTimer[flash] = 0
+        # Exponential flashing
+        self.flashTime[flash] /= 1.3
+        thawed = i[self.freezeTimer[i] >= FREEZETIME]
+        self.visible[thawed] = True
+        self.frozen[thawed] = False
+        self.freezeTimer[thawed] = 0
+        self.flashTime[thawed] = FLASHTIME
+        self.friendly[thawed] = True
+        self.writeFlags(np.union1d(flash, thawed))
+
+    def updateSafe(self, dt, i):
+        for row in i.tolist():
+            enemy = self.objects[row]
+            enemy.image = enemy.safeImage
+        self.safeTimer[i] += dt
+        safe = i[self.safeTimer[i] >= SAFETIME]
+        self.safeTimer[safe] = 0
+        self.friendly[safe] = False
+        self.writeFlags(safe)
+
+    def resolve(self, dt, hitX, hitY, bombjack):
+        """Applies the collision responses and the moves, and writes the new positions back."""
+        i = self.moving
+        dx, dy = self.resolveMove(dt, i, self.dx, self.dy, hitX, hitY, bombjack)
+        self.x[i] += dx
+        self.y[i] += dy
+        for row, x, y in zip(i.tolist(), self.x[i].tolist(), self.y[i].tolist()):
+            enemy = self.objects[row]
+            enemy.x = x
+            enemy.y = y
+
+    def getTiles(self, field, i):
+        return field.tilesAt(self.x[i], self.y[i]+self.h[i]/2)
+
+    def getAim(self, field, bombjack, i, tiles):
+        """Returns where the enemies in rows i should head from tiles, as `Enemy.getAim` does."""
+        wx = field.waypointX[tiles]
+        wy = field.waypointY[tiles]
+        direct = np.isnan(wx)
+        diffx = np.where(direct, bombjack.x-self.x[i], wx-self.x[i])
+        diffy = np.where(direct, bombjack.y-self.y[i], wy-(self.y[i]+self.h[i]/2))
+        return diffx, diffy
+
+
+class ClubArrays(EnemyArrays):
+    def getMove(self, dt, bombjack, i, field):
+        self.timer[i] += dt
+        tiles = self.getTiles(field, i)
+        aim = (self.timer[i] > self.time[i]) | (tiles != self.tile[i])
+        s = i[aim]
+        diffx, diffy = self.getAim(field, bombjack, s, tiles[aim])
+        dist = np.sqrt(diffx*diffx+diffy*diffy)
+        self.vx[s] = self.v[s]*diffx/dist*dt
+        self.vy[s] = self.v[s]*diffy/dist*dt
+        self.direction[s] = diffx
+        self.timer[s] = 0
+        self.tile[s] = tiles[aim]
+        return self.vx[i], self.vy[i]
+
+    def resolveMove(self, dt, i, dx, dy, hitX, hitY, bombjack):
+        s = i[hitX]
+        self.direction[s] *= -1
+        self.vx[s] *= -1
+        self.timer[s] = 0
+        s = i[hitY]
+        self.vy[s] *= -1
+        self.timer[s] = 0
+        return dx, dy
+
+
+class BirdArrays(EnemyArrays):
+    animations = ('HORIZ', 'VERT')
+    mirrored = False
+
+    def getImages(self, sprites):
+        # Horizontal frames, their mirrored images, then the vertical frames
+        horizontal = sprites.animations['HORIZ'].frames
+        vertical = sprites.animations['VERT'].frames
+        return ([sprites.getImage(*frame) for frame in horizontal] +
+                [sprites.getFlippedImage(*frame) for frame in horizontal] +
+                [sprites.getImage(*frame) for frame in vertical])
+
+    def animate(self, dt, i):
+        across = np.abs(self.direction[i]) == 1
+        h = i[across]
+        horizontal = len(self.objects[0].sprites.animations['HORIZ'].frames)
+        self.setImages(h, self.stepAnimation('HORIZ', dt, h) + np.where(self.direction[h] > 0, horizontal, 0))
+        v = i[~across]
+        self.setImages(v, self.stepAnimation('VERT', dt, v) + 2*horizontal)
+
+    def getMove(self, dt, bombjack, i, field):
+        self.timer[i] += dt
+        tiles = self.getTiles(field, i)
+        stopped = self.timer[i] >= self.time[i]
+        restart = stopped & (self.timer[i] >= 1.5*self.time[i])
+        s = i[stopped]
+        self.vx[s] = 0
+        self.vy[s] = 0
+        self.direction[s] = 0
+        # Bird.getMove's turns in the middle of new tiles
+        cx, cy = field.getCenters(tiles)
+        across = np.abs(self.direction[i]) == 1
+        aheadX = (cx-self.x[i])*self.direction[i]
+        aheadY = (cy-(self.y[i]+self.h[i]/2))*self.direction[i]/2
+        step = self.v[i]*dt
+        reach = ~stopped & (self.direction[i] != 0) & (tiles != self.tile[i])
+        reach &= np.where(across, (0 <= aheadX) & (aheadX <= step), (0 <= aheadY) & (aheadY <= step))
+        s = i[reach & across]
+        self.x[s] = cx[reach & across]
+        s = i[reach & ~across]
+        self.y[s] = cy[reach & ~across]-self.h[s]/2
+        s = i[reach]
+        self.vx[s] = 0
+        self.vy[s] = 0
+        aim = restart | reach
+        self.aim(field, bombjack, i[aim], tiles[aim])
+        self.timer[i[restart]] = 0
+        return self.vx[i]*dt, self.vy[i]*dt
+
+    def aim(self, field, bombjack, s, tiles):
+        # Bird.aim
+        cx, cy = field.getCenters(tiles)
+        wx = field.waypointX[tiles]
+        wy = field.waypointY[tiles]
+        direct = np.isnan(wx)
+        offX = cx-self.x[s]
+        offY = cy-(self.y[s]+self.h[s]/2)
+        laneY = ~direct & (wy == cy) & (np.abs(offY) >= 1)
+        laneX = ~direct & ~laneY & (wx == cx) & (np.abs(offX) >= 1)
+        diffx = np.where(direct, bombjack.x-self.x[s], np.where(laneY, 0, np.where(laneX, offX, wx-cx)))
+        diffy = np.where(direct, bombjack.y-self.y[s], np.where(laneY, offY, np.where(laneX, 0, wy-cy)))
+        self.tile[s] = np.where(laneX | laneY, -1, tiles)
+        across = np.abs(diffx) > np.abs(diffy)
+        h = s[across]
+        self.direction[h] = diffx[across]/np.abs(diffx[across])
+        self.vx[h] = self.v[h]*self.direction[h]
+        v = s[~across]
+        self.direction[v] = 2*diffy[~across]/np.abs(diffy[~across])
+        self.vy[v] = self.v[v]*(self.direction[v]/2)
+
+    def resolveMove(self, dt, i, dx, dy, hitX, hitY, bombjack):
+        return np.where(hitX, 0, dx), np.where(hitY, 0, dy)
+
+
+class UFOArrays(EnemyArrays):
+    mirrored = False
+
+    def getMove(self, dt, bombjack, i, field):
+        # UFO.steer, for the UFOs that changed tile
+        tiles = self.getTiles(field, i)
+        changed = tiles != self.tile[i]
+        s = i[changed]
+        diffx, diffy = self.getAim(field, bombjack, s, tiles[changed])
+        dist = np.sqrt(diffx*diffx+diffy*diffy)
+        steer = dist > 0
+        t = s[steer]
+        bx = bombjack.x-self.x[t]
+        by = bombjack.y-self.y[t]
+        self.v[t] = np.sqrt(bx*bx+by*by)
+        self.vx[t] = self.v[t]*diffx[steer]/dist[steer]
+        self.vy[t] = self.v[t]*diffy[steer]/dist[steer]
+        self.tile[s] = tiles[changed]
+        return self.vx[i]*dt, self.vy[i]*dt
+
+    def resolveMove(self, dt, i, dx, dy, hitX, hitY, bombjack):
+        # UFO.setVelocity, called for x and then y; the call for y, if any, wins
+        hit = hitX | hitY
+        s = i[hit]
+        sdx = np.where(hitY[hit], 0, dx[hit])
+        sdy = np.where(hitY[hit], dy[hit], 0)
+        diffx = bombjack.x-self.x[s]
+        diffy = bombjack.y-self.y[s]
+        flipx = sdx*diffx > 0
+        flipy = ~flipx & (sdy*diffy > 0)
+        diffx = np.where(flipx, -diffx, diffx)
+        diffy = np.where(flipy, -diffy, diffy)
+        dist = np.sqrt(diffx*diffx+diffy*diffy)
+        self.v[s] = dist
+        self.vx[s] = dist*diffx/dist
+        self.vy[s] = dist*diffy/dist
+        return self.vx[i]*dt, self.vy[i]*dt
+
+
+class OrbArrays(EnemyArrays):
+    def getMove(self, dt, bombjack, i, field):
+        self.timer[i] += dt
+        s = i[self.timer[i] >= self.time[i]]
+        diffy = bombjack.y-self.y[s]
+        self.vx[s] = self.v[s]*dt*self.direction[s]
+        self.vy[s] = self.v[s]*diffy/200*dt
+        self.timer[s] = 0
+        return self.vx[i], self.vy[i]
+
+    def resolveMove(self, dt, i, dx, dy, hitX, hitY, bombjack):
+        s = i[hitX]
+        self.direction[s] *= -1
+        self.vx[s] *= -1
+        s = i[hitY]
+        self.vy[s] *= -1
+        self.timer[s] = 0
+        return dx, dy
+
+
+class SphereArrays(EnemyArrays):
+    def getMove(self, dt, bombjack, i, field):
+        self.timer[i] += dt
+        s = i[self.timer[i] >= self.time[i]]
+        diffx = bombjack.x-self.x[s]
+        self.vx[s] = self.v[s]*diffx/200*dt
+        self.vy[s] = self.v[s]*self.direction[s]*dt
+        self.timer[s] = 0
+        return self.vx[i], self.vy[i]
+
+    def resolveMove(self, dt, i, dx, dy, hitX, hitY, bombjack):
+        s = i[hitX]
+        self.vx[s] *= -1
+        self.timer[s] = 0
+        s = i[hitY]
+        self.direction[s] *= -1
+        self.vy[s] *= -1
+        self.timer[s] = 0
+        return dx, dy
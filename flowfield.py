@@ -0,0 +1,90 @@
+from collections import deque
+import numpy as np
+from constants import *
+
+"""
+A flow field over the level's tiles that leads the chasing enemies to Bomb Jack.
+
+The field is searched breadth-first from the tile Bomb Jack is in, through
+the tiles no platform overlaps, and gives every tile the center of the next
+tile on a shortest path to him. Chasers steer for that point instead of for
+Bomb Jack himself, so they go around platforms rather than into them. The
+search runs again only when Bomb Jack changes tile, and serves every enemy.
+"""
+
+
+class FlowField(object):
+    """The way to Bomb Jack from every tile of a level.
+
+    Tiles are numbered `row*NCOLS+col`. A point is in the tile that contains
+    it, clamped to the grid.
+
+    Attributes:
+        blocked (list): Whether a platform overlaps each tile.
+        target (int): The tile the field leads to, or -1 before the first search.
+        waypoints (list): For each tile, the center of the next tile on the way to the target, or None
+            where an enemy should steer straight for Bomb Jack: in the target and the tiles next to it,
+            and in tiles the target cannot be reached from.
+        waypointX, waypointY (numpy.ndarray): The waypoints as arrays, NaN where there is none.
+    """
+    def __init__(self, platforms):
+        self.blocked = [len(platforms.cells[tile]) > 0 for tile in range(NROWS*NCOLS)]
+        self.target = -1
+        self.waypoints = [None]*(NROWS*NCOLS)
+        self.waypointX = np.full(NROWS*NCOLS, np.nan)
+        self.waypointY = np.full(NROWS*NCOLS, np.nan)
+
+    @staticmethod
+    def tileAt(x, y):
+        row = min(max(int(y // TILEHEIGHT), 0), NROWS-1)
+        col = min(max(int(x // TILEWIDTH), 0), NCOLS-1)
+        return row*NCOLS+col
+
+    @staticmethod
+    def getCenter(tile):
+        row, col = divmod(tile, NCOLS)
+        return (col+0.5)*TILEWIDTH, (row+0.5)*TILEHEIGHT
+
+    @staticmethod
+    def getCenters(tiles):
+        """Returns the centers of an array of tiles, as `getCenter` does for one."""
+        rows, cols = np.divmod(tiles, NCOLS)
+        return (cols+0.5)*TILEWIDTH, (rows+0.5)*TILEHEIGHT
+
+    @staticmethod
+    def tilesAt(x, y):
+        """Returns the tiles of arrays of points, as `tileAt` does for one."""
+        rows = np.clip(np.floor_divide(y, TILEHEIGHT), 0, NROWS-1).astype(np.intp)
+        cols = np.clip(np.floor_divide(x, TILEWIDTH), 0, NCOLS-1).astype(np.intp)
+        return rows*NCOLS+cols
+
+    def retarget(self, bombjack):
+        """Leads the field to the middle of Bomb Jack, searching again only if he changed tile."""
+        tile = self.tileAt(bombjack.x, bombjack.y+bombjack.h/2)
+        if tile == self.target:
+            return False
+        self.target = tile
+        self.search()
+        return True
+
+    def search(self):
+        target = self.target
+        parents = [-1]*(NROWS*NCOLS)
+        parents[target] = target
+        queue = deque([target])
+        while queue:
+            tile = queue.popleft()
+            row, col = divmod(tile, NCOLS)
+            for neighbour, inside in ((tile-NCOLS, row > 0), (tile+NCOLS, row < NROWS-1),
+                                      (tile-1, col > 0), (tile+1, col < NCOLS-1)):
+                if inside and parents[neighbour] < 0 and not self.blocked[neighbour]:
+                    parents[neighbour] = tile
+                    queue.append(neighbour)
+        for tile, parent in enumerate(parents):
+            if parent < 0 or parent == target:
+                waypoint = None
+                self.waypointX[tile] = self.waypointY[tile] = np.nan
+            else:
+                waypoint = self.getCenter(parent)
+                self.waypointX[tile], self.waypointY[tile] = waypoint
+            self.waypoints[tile] = waypoint
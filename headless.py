@@ -0,0 +1,110 @@
+import sys
+import time
+import hashlib
+import argparse
+import pygame
+from pygame.locals import *
+from constants import *
+from run import GameController
+
+"""
+Runs the game simulation without a window, clock or rendering.
+
+The player's input comes from a supplied stream instead of the keyboard, and
+every frame advances the game by the same fixed `dt`, so runs are repeatable
+and as fast as the simulation itself. Bomb Jack, the enemies, cherries and
+the power coin go through exactly the same updates as in the windowed game.
+
+An input stream has one line per frame, with the keys held down during the
+frame and the keys pressed on it separated by a semicolon, e.g.
+`right,up;up`. Key names are up, down, left, right and space.
+
+Usage:
+    python headless.py [inputfile] [--frames N] [--dt SECONDS]
+"""
+
+
+KEYNAMES = {'up': K_UP, 'down': K_DOWN, 'left': K_LEFT, 'right': K_RIGHT, 'space': K_SPACE}
+
+
+class HeldKeys(object):
+    """Stands in for the result of `pygame.key.get_pressed()`.
+
+    Attributes:
+        keys (frozenset): The keys held down.
+    """
+    def __init__(self, keys=()):
+        self.keys = frozenset(keys)
+
+    def __getitem__(self, key):
+        return key in self.keys
+
+
+def parseKeys(names):
+    return [KEYNAMES[name.strip()] for name in names.split(',') if name.strip()]
+
+
+def readInputs(lines):
+    """Yields (held, pressed) key lists from the lines of an input stream."""
+    for line in lines:
+        held, _, pressed = line.strip().partition(';')
+        yield parseKeys(held), parseKeys(pressed)
+
+
+class HeadlessGame(object):
+    """Drives a `GameController` from supplied input with a fixed timestep.
+
+    Attributes:
+        game (GameController): The game being simulated.
+        dt (float): The time each frame advances the game by, in seconds.
+        frames (int): The number of frames simulated so far.
+    """
+    def __init__(self, dt=TIMESTEP, enemyArrays=ENEMYARRAYS):
+        self.game = GameController(headless=True, enemyArrays=enemyArrays)
+        self.game.startGame()
+        self.dt = dt
+        self.frames = 0
+
+    def step(self, held=(), pressed=()):
+        """Simulates one frame with `held` keys down and a KEYDOWN for each key in `pressed`."""
+        events = [pygame.event.Event(KEYDOWN, key=key) for key in pressed]
+        self.game.step(self.dt, HeldKeys(held), events)
+        self.frames += 1
+
+    def run(self, inputs):
+        for held, pressed in inputs:
+            self.step(held, pressed)
+        return self
+
+    def summary(self):
+        return {'frames': self.frames, 'round': self.game.round, 'score': self.game.score,
+                'lives': self.game.lives, 'cherries': len(self.game.cherries.cherryList),
+                'state': hashlib.sha1(repr(self.game.snapshot()).encode()).hexdigest()[:16]}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run Bomb Jack without a window.")
+    parser.add_argument('inputfile', nargs='?', help="input stream to play, '-' for stdin")
+    parser.add_argument('--frames', type=int, default=None,
+                        help="frames to simulate; with no input stream, no keys are pressed")
+    parser.add_argument('--dt', type=float, default=TIMESTEP, help="seconds each frame advances the game by")
+    parser.add_argument('--enemy-arrays', action='store_true', default=ENEMYARRAYS,
+                        help="update the chasing enemies as NumPy arrays")
+    args = parser.parse_args()
+
+    def play(inputs):
+        if args.frames is not None:
+            inputs = (frame for frame, _ in zip(inputs, range(args.frames)))
+        return HeadlessGame(args.dt, args.enemy_arrays).run(inputs)
+
+    start = time.perf_counter()
+    if args.inputfile == '-':
+        headless = play(readInputs(sys.stdin))
+    elif args.inputfile:
+        with open(args.inputfile) as f:
+            headless = play(readInputs(f))
+    else:
+        headless = play(((), ()) for _ in range(args.frames or 0))
+    elapsed = time.perf_counter()-start
+    print(headless.summary())
+    print(f"{headless.frames} frames in {elapsed:.2f} s ({headless.frames/max(elapsed, 1e-9):.0f} frames/s)")
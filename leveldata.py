@@ -0,0 +1,380 @@
+import os
+import json
+import pickle
+import numpy as np
+from constants import *
+from profiler import profiler
+from cachefiles import writeCacheFile
+
+"""Module for parsing level files into the data the game objects are built from.
+
+A level file is read once into a `LevelData`, which is kept in memory and,
+optionally, pickled next to the other caches so later launches skip the text
+parsing too. Both caches are invalidated when the level file's mtime changes.
+
+Levels can also be compiled ahead of time into one packed bundle (see
+`compile_levels.py`), which is read in a single call at startup.
+"""
+
+PLATSYMBOL = '-'
+CHERRYTAGS = '0123456789)!@#$%^&*('
+ENEMYSYMBOLS = 'bcupo'
+# Bump when LevelData changes so stale disk caches are ignored
+LEVELFORMAT = 2
+
+# The platforms around the edge of every level, as (x, y, w, h, orientation)
+BORDERS = (
+    # TOP
+    (0, PLATFORMSIZE/2, SCREENWIDTH, PLATFORMSIZE, 2),
+    # BOTTOM
+    (0, SCREENHEIGHT-PLATFORMSIZE-PLATFORMSIZE/2, SCREENWIDTH, PLATFORMSIZE, 2),
+    # LEFT
+    (0, PLATFORMSIZE/2, PLATFORMSIZE, SCREENHEIGHT-PLATFORMSIZE, -1),
+    # RIGHT
+    (SCREENWIDTH-PLATFORMSIZE, PLATFORMSIZE/2, PLATFORMSIZE, SCREENHEIGHT-PLATFORMSIZE, 1),
+)
+
+# The collision grid is one tile per cell, with an extra row for the enemy row of the map
+GRIDROWS = NROWS+1
+GRIDCOLS = NCOLS
+
+
+class LevelData(object):
+    """The parsed contents of one level file.
+
+    Attributes:
+        platforms (tuple): (x, y, w, h) of each platform in the map, in the order they are created.
+        cherries (tuple): (row, col, bunch) of each cherry, in lit cherry traversal order.
+        enemies (tuple): (symbol, row, col, spawnRow, spawnCol) of each enemy, in file order.
+            The spawn location is the mummy spawner seen so far, which mummies carrying the
+            enemy start from.
+        spawner (tuple): (row, col) of the last mummy spawner in the file.
+        cellIndex (tuple): The (cellStart, cellPlatforms) collision index from `buildCellIndex`,
+            over the map platforms followed by the `BORDERS`.
+    """
+    def __init__(self, platforms, cherries, enemies, spawner, cellIndex=None):
+        self.platforms = tuple(platforms)
+        self.cherries = tuple(cherries)
+        self.enemies = tuple(enemies)
+        self.spawner = tuple(spawner)
+        if cellIndex is None:
+            cellIndex = buildCellIndex(self.getPlatformRects())
+        self.cellIndex = cellIndex
+
+    @classmethod
+    def parse(cls, data):
+        platforms = connectHorizontally(data) + connectVertically(data)
+        enemies, spawner = createEnemyList(data)
+        return cls(platforms, createCherryList(data), enemies, spawner)
+
+    def getPlatformRects(self):
+        """Returns the rect of every platform in the level, in the order `PlatformGroup` creates them."""
+        rects = [platformRect(x, y, w, h) for x, y, w, h in self.platforms]
+        rects += [platformRect(*border) for border in BORDERS]
+        return rects
+
+
+def platformRect(x, y, w, h, orientation=0):
+    """Returns the (x, y, w, h) rect of a platform created from a map span."""
+    y = y-PLATFORMSIZE/2
+    if abs(orientation) == 0:
+        y = y+h/2
+    return (x, y, w, h)
+
+
+def getCellRange(x, w, cellsize, ncells):
+    """
+    Returns the range of cells a rect's extent covers along one axis.
+
+    Coordinates are truncated like `pygame.Rect`, so two rects collide only if
+    they share a cell, which makes the index exact rather than approximate.
+    """
+    x, w = int(x), int(w)
+    if w <= 0:
+        return range(0)
+    return range(max(x//cellsize, 0), min((x+w-1)//cellsize, ncells-1)+1)
+
+
+def buildCellIndex(rects):
+    """
+    Returns a compressed index of which rects overlap each grid cell.
+
+    The platforms overlapping cell (row, col) are
+    `cellPlatforms[cellStart[c]:cellStart[c+1]]` with `c = row*GRIDCOLS+col`,
+    listed in increasing order.
+    """
+    cells = [[] for _ in range(GRIDROWS*GRIDCOLS)]
+    for i, (x, y, w, h) in enumerate(rects):
+        for row in getCellRange(y, h, TILEHEIGHT, GRIDROWS):
+            for col in getCellRange(x, w, TILEWIDTH, GRIDCOLS):
+                cells[row*GRIDCOLS+col].append(i)
+    cellStart = np.zeros(len(cells)+1, dtype=np.int32)
+    cellStart[1:] = np.cumsum([len(cell) for cell in cells])
+    cellPlatforms = np.array([i for cell in cells for i in cell], dtype=np.int32)
+    return cellStart, cellPlatforms
+
+
+def readLevelFile(textfile):
+    return np.loadtxt(textfile, dtype='<U1', comments=None)
+
+
+def connectHorizontally(data):
+    spans = []
+    for row in list(range(data.shape[0])):
+        w = 0
+        x = -1
+        y = row*TILEHEIGHT
+        h = PLATFORMSIZE
+        for col in list(range(data.shape[1])):
+            if data[row][col] == PLATSYMBOL:
+                if x == -1:
+                    x = col*TILEWIDTH
+                w += TILEWIDTH
+                if col + 1 == len(list(range(data.shape[1]))):
+                    spans.append((x, y, w, h))
+            else:
+                if x != -1:
+                    spans.append((x, y, w, h))
+                    x = -1
+                    w = 0
+    return spans
+
+
+def connectVertically(data):
+    spans = []
+    dataT = data.transpose()
+    for col in list(range(dataT.shape[0])):
+
+        for row in list(range(dataT.shape[1])):
+            x = col*TILEWIDTH
+            y = -1
+            h = 0
+            w = PLATFORMSIZE
+            if dataT[col][row] == PLATSYMBOL:
+                if y == -1:
+                    y = row*TILEHEIGHT
+                h += TILEHEIGHT
+                if row + 1 == len(list(range(dataT.shape[1]))):
+                    spans.append((x, y, w, h))
+            else:
+                if y != -1:
+                    spans.append((x, y, w, h))
+                    y = -1
+                    h = 0
+    return spans
+
+
+def createCherryList(data):
+    """
+    Returns the cherries in lit cherry traversal order.
+
+    See `CherryGroup.createCherryList` for how bunch tags order the cherries.
+    """
+    cherries = []
+    # Parse the cherries and sort the cherry list using insertion sort
+    for row in range(data.shape[0]):
+        for col in range(data.shape[1]):
+            try:
+                bunch_tag = data[row][col]
+                index = CHERRYTAGS.index(bunch_tag)
+                bunch_number = index % 10
+                i = 0
+                # If the bunch tag is a number, keep the order the same as traversed
+                if index > 9:
+                    while i < len(cherries) and cherries[i][2] < bunch_number:
+                        i += 1
+                # If the bunch tag is a symbol, reverse the order relative to traversal
+                else:
+                    while i < len(cherries) and cherries[i][2] <= bunch_number:
+                        i += 1
+                cherries.insert(i, (row, col, bunch_number))
+            except ValueError:
+                pass
+    return cherries
+
+
+def createEnemyList(data):
+    """
+    Returns the enemies in file order and the mummy spawner location.
+
+    See `EnemyGroup.createEnemyList` for the enemy symbols.
+    """
+    enemies = []
+    spawnRow, spawnCol = 0, 0
+    for row in range(data.shape[0]):
+        for col in range(data.shape[1]):
+            symbol = data[row][col]
+            # Mummy spawner
+            if symbol == 's':
+                spawnRow, spawnCol = row, col
+            elif symbol in ENEMYSYMBOLS:
+                enemies.append((str(symbol), row, col, spawnRow, spawnCol))
+    return tuple(enemies), (spawnRow, spawnCol)
+
+
+class LevelBundle(object):
+    """
+    A packed file holding many compiled levels.
+
+    The file is the magic bytes, a little-endian uint32 header length, a JSON
+    header and then the raw arrays of every level, each aligned to 8 bytes.
+    The header lists the levels in play order, each with the path of the text
+    file it was compiled from, that file's mtime and size, and the dtype, shape
+    and offset of each of its arrays.
+
+    Attributes:
+        levels (dict): Maps a level file path, e.g. 'levels/level0.txt', to its (mtime, size, LevelData),
+            in play order.
+    """
+    MAGIC = b'BJL2'
+
+    def __init__(self, levels):
+        self.levels = levels
+
+    @staticmethod
+    def pack(level):
+        """Returns the arrays that store level."""
+        cellStart, cellPlatforms = level.cellIndex
+        return {
+            'platforms': np.array(level.platforms, dtype=np.float64).reshape(-1, 4),
+            'cherries': np.array(level.cherries, dtype=np.int32).reshape(-1, 3),
+            'enemies': np.array([(ord(symbol),) + tuple(rest) for symbol, *rest in level.enemies],
+                                dtype=np.int32).reshape(-1, 5),
+            'spawner': np.array(level.spawner, dtype=np.int32),
+            'cellStart': np.asarray(cellStart, dtype=np.int32),
+            'cellPlatforms': np.asarray(cellPlatforms, dtype=np.int32),
+        }
+
+    @staticmethod
+    def unpack(arrays):
+        """Returns the LevelData stored in arrays."""
+        enemies = [(chr(symbol),) + tuple(rest) for symbol, *rest in arrays['enemies'].tolist()]
+        return LevelData([tuple(p) for p in arrays['platforms'].tolist()],
+                         [tuple(c) for c in arrays['cherries'].tolist()],
+                         enemies, arrays['spawner'].tolist(),
+                         (arrays['cellStart'], arrays['cellPlatforms']))
+
+    def write(self, bundlefile):
+        header = []
+        chunks = []
+        offset = 0
+        for path, (mtime, size, level) in self.levels.items():
+            entry = {'path': path, 'mtime': mtime, 'size': size, 'arrays': {}}
+            for key, array in self.pack(level).items():
+                data = np.ascontiguousarray(array, dtype=array.dtype.newbyteorder('<')).tobytes()
+                entry['arrays'][key] = [array.dtype.newbyteorder('<').str, list(array.shape), offset]
+                padding = -len(data) % 8
+                chunks.append(data + bytes(padding))
+                offset += len(data) + padding
+            header.append(entry)
+        header = json.dumps(header).encode()
+        header += b' '*(-(len(self.MAGIC)+4+len(header)) % 8)
+        with open(bundlefile, 'wb') as f:
+            f.write(self.MAGIC)
+            f.write(len(header).to_bytes(4, 'little'))
+            f.write(header)
+            for chunk in chunks:
+                f.write(chunk)
+
+    @classmethod
+    def read(cls, path):
+        # One read of the whole file; the arrays are views into it
+        with open(path, 'rb') as f:
+            buffer = f.read()
+        if buffer[:len(cls.MAGIC)] != cls.MAGIC:
+            raise ValueError(f"{path} is not a level bundle")
+        start = len(cls.MAGIC)+4
+        length = int.from_bytes(buffer[len(cls.MAGIC):start], 'little')
+        header = json.loads(buffer[start:start+length])
+        base = start+length
+        levels = {}
+        for entry in header:
+            arrays = {}
+            for key, (dtype, shape, offset) in entry['arrays'].items():
+                dtype = np.dtype(dtype)
+                count = int(np.prod(shape))
+                arrays[key] = np.frombuffer(buffer, dtype, count, base+offset).reshape(shape)
+            levels[entry['path']] = (entry['mtime'], entry['size'], cls.unpack(arrays))
+        return cls(levels)
+
+
+class LevelLoader(object):
+    """Loads `LevelData`, caching it in memory and optionally on disk.
+
+    When a bundle is loaded, it decides which levels there are and in what
+    order. A bundled level is used as long as its text file is missing or has
+    the mtime and size it was compiled with; otherwise the text file is read.
+
+    Attributes:
+        levels (dict): Class-level cache mapping a level file to its (mtime, LevelData).
+        bundle (LevelBundle): The bundle loaded by `loadBundle`, if any.
+    """
+    levels = {}
+    bundle = None
+
+    @classmethod
+    def loadBundle(cls, path=LEVELBUNDLE):
+        """Loads the level bundle at path, returning False if there is none or it is from an older version."""
+        if not os.path.exists(path):
+            return False
+        with profiler.timed('asset', path):
+            try:
+                cls.bundle = LevelBundle.read(path)
+            except (OSError, ValueError, KeyError):
+                return False
+        return True
+
+    @classmethod
+    def levelFiles(cls):
+        """Returns the level files in play order: those of the bundle, or the NUMLEVELS text levels."""
+        if cls.bundle is not None:
+            return list(cls.bundle.levels)
+        return [f'levels/level{level}.txt' for level in range(NUMLEVELS)]
+
+    @classmethod
+    def load(cls, textfile, diskCache=LEVELCACHE):
+        stat = os.stat(textfile) if os.path.exists(textfile) else None
+        mtime = stat.st_mtime_ns if stat is not None else None
+        cached = cls.levels.get(textfile)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        with profiler.timed('asset', textfile):
+            level = cls.loadUncached(textfile, stat, diskCache)
+        cls.levels[textfile] = (mtime, level)
+        return level
+
+    @classmethod
+    def loadUncached(cls, textfile, stat, diskCache):
+        mtime = stat.st_mtime_ns if stat is not None else None
+        level = None
+        if cls.bundle is not None:
+            bundled = cls.bundle.levels.get(textfile)
+            if bundled is not None and (stat is None or bundled[:2] == (stat.st_mtime_ns, stat.st_size)):
+                level = bundled[2]
+        cachefile = os.path.join(CACHEDIR, os.path.basename(textfile) + '.pickle')
+        if level is None and diskCache:
+            level = cls.readCache(cachefile, mtime)
+        if level is None:
+            level = LevelData.parse(readLevelFile(textfile))
+            if diskCache:
+                cls.writeCache(cachefile, mtime, level)
+        return level
+
+    @staticmethod
+    def readCache(cachefile, mtime):
+        try:
+            with open(cachefile, 'rb') as f:
+                version, cachedMtime, level = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError, TypeError):
+            return None
+        if version != LEVELFORMAT or cachedMtime != mtime:
+            return None
+        return level
+
+    @staticmethod
+    def writeCache(cachefile, mtime, level):
+        writeCacheFile(cachefile, lambda f: pickle.dump((LEVELFORMAT, mtime, level), f, pickle.HIGHEST_PROTOCOL))
+
+
+def loadLevel(textfile):
+    return LevelLoader.load(textfile)
@@ -0,0 +1,60 @@
+import pygame
+from constants import *
+from profiler import profiler
+
+"""
+Module for the background music.
+
+The music is opened once and kept open for the whole session, so starting a
+round only rewinds it instead of reopening and decoding the file again.
+"""
+
+
+class Music(object):
+    """Plays one looping track.
+
+    By default the track is streamed through `pygame.mixer.music`. With
+    `preload` set it is decoded into a `pygame.mixer.Sound` once, which costs
+    memory but no disk reads at all after startup. If the mixer is not
+    initialized, every method does nothing.
+
+    Attributes:
+        filename (str): The music file.
+        preload (bool): Whether the track is decoded into memory.
+        sound (pygame.mixer.Sound): The decoded track, when preloaded.
+        channel (pygame.mixer.Channel): The channel the decoded track plays on.
+        loaded (bool): Whether the track has been opened.
+    """
+    def __init__(self, filename=MUSICFILE, preload=MUSICPRELOAD):
+        self.filename = filename
+        self.preload = preload
+        self.sound = None
+        self.channel = None
+        self.loaded = False
+
+    def load(self):
+        if self.loaded or not pygame.mixer.get_init():
+            return
+        with profiler.timed('asset', self.filename):
+            if self.preload:
+                try:
+                    self.sound = pygame.mixer.Sound(self.filename)
+                except pygame.error:
+                    # This mixer cannot decode the file into memory, so stream it
+                    self.sound = None
+            if self.sound is None:
+                pygame.mixer.music.load(self.filename)
+        self.loaded = True
+
+    def play(self):
+        """Starts the track from the beginning, looping forever."""
+        self.load()
+        if not self.loaded:
+            return
+        if self.sound is not None:
+            if self.channel is not None:
+                self.channel.stop()
+            self.channel = self.sound.play(-1)
+        else:
+            # Playing the loaded stream again restarts it without reopening the file
+            pygame.mixer.music.play(-1)
@@ -1,15 +1,18 @@
 import pygame
 from constants import *
-import numpy as np
-from sprites import Spritesheet
+from sprites import SpriteAtlas
+from leveldata import loadLevel, platformRect, getCellRange, BORDERS, GRIDROWS, GRIDCOLS
 from math import ceil
+from collisions import rectArray
+from flowfield import FlowField
 
 
 class Platform(object):
     """Represents a platform object in the game.
 
     A platform can be horizontal or vertical and is defined by its position, size, level, and orientation.
-    The platform has a gradient color scheme based on the game level.
+    The platform has a gradient color scheme based on the game level. The gradient is baked once into
+    a surface shared by every platform with the same size, orientation and palette.
 
     Attributes:
         x (float): The x-coordinate of the platform.
@@ -18,56 +21,78 @@ class Platform(object):
         h (float): The height of the platform.
         level (int): The game level the platform belongs to.
         orientation (int): The orientation of the platform, where 0 is horizontal, and -1 or 1 are vertical.
-        image (Surface): The image of the platform.
-        sheet (Surface): The spritesheet used for loading colors.
-        colors (list): The list of colors for different levels.
+        image (Surface): The baked image of the platform.
+        rect (pygame.Rect): The collision rect of the platform, which never moves.
+        images (dict): Class-level cache of baked images, keyed by size, orientation, palette and subpixel offset.
+        colors (list): Class-level list of colors for different levels, sampled once per process.
     """
-    
+    __slots__ = ('x', 'y', 'w', 'h', 'rect', 'level', 'orientation', 'image')
+    images = {}
+    colors = []
+
     def __init__(self, x, y, w, h, level, orientation=0):
-        self.x = x
-        self.y = y-PLATFORMSIZE/2
-        if abs(orientation) == 0:
-            self.y = self.y+h/2
-        self.w = w
-        self.h = h
+        self.x, self.y, self.w, self.h = platformRect(x, y, w, h, orientation)
+        self.rect = pygame.Rect(self.x, self.y, self.w, self.h)
         self.level = level
         # Let 0 be in map, 2 be edge horiztonal, -1 be vertical left, 1 be veritcal right
         self.orientation = orientation
-        self.image = None
-        self.sheet = pygame.image.load(
-            "spritesheets/spritesheet_bombjack8.png").convert()
-        # Contains the colors for each level
-        self.colors = []
-        self.init_colors()
-
-    def init_colors(self):
+        if not Platform.colors:
+            Platform.init_colors()
+        self.image = self.getImage()
+
+    @classmethod
+    def init_colors(cls):
         # NOTE: We want 8 colors per level
+        color = SpriteAtlas.get().getSourceColor
         ORANGE = []
         for i in range(2):
-            ORANGE.append(self.sheet.get_at((291-8*i, 149)))
+            ORANGE.append(color(291-8*i, 149))
         for i in range(6):
-            ORANGE.append(self.sheet.get_at((84-8*i, 292)))
+            ORANGE.append(color(84-8*i, 292))
 
         GREEN = []
         for i in range(8):
-            GREEN.append(self.sheet.get_at((306+8*i, 280)))
+            GREEN.append(color(306+8*i, 280))
 
         BLUE = []
         for i in range(6):
-            BLUE.append(self.sheet.get_at((144+8*i, 292)))
-        BLUE.append(self.sheet.get_at((204, 292)))
-        BLUE.append(self.sheet.get_at((204, 292)))
+            BLUE.append(color(144+8*i, 292))
+        BLUE.append(color(204, 292))
+        BLUE.append(color(204, 292))
 
         YELLOW = []
         for i in range(6):
-            YELLOW.append(self.sheet.get_at((292-8*i, 148)))
-        YELLOW.append(self.sheet.get_at((292-8*5, 148)))
-        YELLOW.append(self.sheet.get_at((292-8*5, 148)))
+            YELLOW.append(color(292-8*i, 148))
+        YELLOW.append(color(292-8*5, 148))
+        YELLOW.append(color(292-8*5, 148))
+
+        cls.colors = [ORANGE, GREEN, ORANGE, YELLOW, BLUE]
+
+    def getImage(self):
+        """
+        Returns the baked gradient for this platform, rendering it on first use.
 
-        self.colors = [ORANGE, GREEN, ORANGE, YELLOW, BLUE]
+        The image is drawn relative to the platform's whole-pixel position, so the
+        fractional part of x and y is part of the key to keep the result pixel exact.
+        """
+        left, top = int(self.x), int(self.y)
+        palette = self.level % len(Platform.colors)
+        key = (self.w, self.h, self.orientation, palette, self.x-left, self.y-top)
+        image = Platform.images.get(key)
+        if image is None:
+            # Leave a pixel of slack for gradient strips that round past the edge
+            image = pygame.Surface((ceil(self.x-left+self.w)+1, ceil(self.y-top+self.h)+1))
+            image.fill(MAGENTA)
+            image.set_colorkey(MAGENTA)
+            self.bake(image, left, top)
+            Platform.images[key] = image
+        return image
 
     def get_rect(self):
-        return pygame.Rect(self.x, self.y, self.w, self.h)
+        return self.rect
+
+    def render(self, screen):
+        screen.blit(self.image, (int(self.x), int(self.y)))
 
     # Draws a scaled bitmap on this rect from color start to color end
     def draw_gradient(self, screen, start, end, rect):
@@ -88,98 +113,184 @@ class Platform(object):
             bitmap, (round(width), round(height)))
         screen.blit(bitmap, rect)
 
-    def render(self, screen):
-        # print(self.get_rect())
+    def bake(self, screen, left, top):
+        """Draws the gradient onto screen, as if screen's origin were at (left, top)."""
         level = self.level
-        colors = self.colors[level % len(self.colors)]
+        colors = Platform.colors[level % len(Platform.colors)]
         numRects = len(colors)-1
         # print(numRects)
         for i in range(numRects):
             if self.orientation == -1:
                 dx = self.w/numRects
                 self.draw_gradient(
-                    screen, colors[i], colors[i+1], pygame.Rect(self.x+i*dx, self.y+i*dx, ceil(self.w/numRects), self.h-2*i*dx))
+                    screen, colors[i], colors[i+1], pygame.Rect(self.x-left+i*dx, self.y-top+i*dx, ceil(self.w/numRects), self.h-2*i*dx))
             elif self.orientation == 1:
                 dx = self.w/numRects
                 self.draw_gradient(
-                    screen, colors[i], colors[i+1], pygame.Rect(self.x+i*dx, self.y+(numRects-i)*dx, ceil(self.w/numRects), self.h-2*(numRects-i)*dx))
+                    screen, colors[i], colors[i+1], pygame.Rect(self.x-left+i*dx, self.y-top+(numRects-i)*dx, ceil(self.w/numRects), self.h-2*(numRects-i)*dx))
             else:
                 # To make it rounded
                 if self.orientation == 0 and i <= 0:
                     self.draw_gradient(
-                        screen, colors[i], colors[i+1], pygame.Rect(self.x+2, self.y+self.h*i/numRects, self.w-4, ceil(self.h/numRects)))
+                        screen, colors[i], colors[i+1], pygame.Rect(self.x-left+2, self.y-top+self.h*i/numRects, self.w-4, ceil(self.h/numRects)))
                 elif self.orientation == 0 and i >= numRects-1:
                     self.draw_gradient(
-                        screen, colors[i], colors[i+1], pygame.Rect(self.x+2, self.y+self.h*i/numRects, self.w-4, ceil(self.h/numRects)))
+                        screen, colors[i], colors[i+1], pygame.Rect(self.x-left+2, self.y-top+self.h*i/numRects, self.w-4, ceil(self.h/numRects)))
                 else:
                     self.draw_gradient(
-                        screen, colors[i], colors[i+1], pygame.Rect(self.x, self.y+self.h*i/numRects, self.w, ceil(self.h/numRects)))
+                        screen, colors[i], colors[i+1], pygame.Rect(self.x-left, self.y-top+self.h*i/numRects, self.w, ceil(self.h/numRects)))
+
+
+class WalkSpan(object):
+    """The top surface of a horizontal platform, as a mummy walks it.
+
+    Attributes:
+        platform (Platform): The platform whose top this is.
+        top (float): The height of the surface.
+        start (float): Where the surface begins.
+        end (float): Where the surface ends.
+        walls (list): The (left, right) edges of the other platforms that rise into the rect of a
+            mummy walking the surface, within its reach, in the truncated terms of `pygame.Rect`.
+    """
+    __slots__ = ('platform', 'top', 'start', 'end', 'walls')
+
+    def __init__(self, platform, walls):
+        self.platform = platform
+        self.top = platform.y
+        self.start = platform.x
+        self.end = platform.x+platform.w
+        self.walls = walls
+
+    def hitsWall(self, left, right):
+        """Returns whether a walking mummy whose rect runs from left to right collides with a wall."""
+        for wallLeft, wallRight in self.walls:
+            if left < wallRight and wallLeft < right:
+                return True
+        return False
+
+
+def moveBox(x, y, w, h, dx, dy):
+    """Returns the box covering a rect moved by dx alone and by dy alone, the two rects movement is tested with."""
+    return pygame.Rect(x+dx, y, w, h).union(pygame.Rect(x, y+dy, w, h))
 
 
 class PlatformGroup(object):
+    """The platforms of a level, with a grid index for collision queries.
+
+    The index comes with the level data (see `leveldata.buildCellIndex`) and
+    lists, for each tile cell, the platforms overlapping it. Since it truncates
+    coordinates like `pygame.Rect`, the platforms in the cells a rect covers
+    include every platform that rect collides with.
+
+    Mummies do not collide with the platforms. They walk along the walkable
+    spans built with the platforms, which list the walls a mummy turns at on
+    each, and drop onto the span looked up below them, so a mummy's path
+    costs a few table lookups however many platforms there are.
+
+    Attributes:
+        platList (list): The platforms, map platforms first and then the borders.
+        level (int): The level the platforms belong to.
+        file (str): The level file.
+        cells (list): For each cell `row*GRIDCOLS+col`, the indices into platList of the platforms
+            overlapping it, in increasing order.
+        rects (numpy.ndarray): The (left, top, right, bottom) edges of each platform, for batched tests.
+        spans (list): The `WalkSpan`s of every platform top, from the highest to the lowest.
+        landings (dict): The span below each (x, y, span) a mummy has fallen from, filled as it is used.
+        flowField (FlowField): The way to Bomb Jack around the platforms, for the chasing enemies.
+    """
     def __init__(self, file, level):
         self.platList = []
-        self.platSymbol = '-'
         self.level = level
         self.file = file
-        data = self.readMapFile(file)
-        self.connectHorizontally(data)
-        self.connectVertically(data)
-        # TOP
-        self.platList.append(Platform(0, PLATFORMSIZE/2,
-                                      SCREENWIDTH, PLATFORMSIZE, self.level, 2))
-        # BOTTOM
-        self.platList.append(Platform(0, SCREENHEIGHT-PLATFORMSIZE-PLATFORMSIZE/2,
-                                      SCREENWIDTH, PLATFORMSIZE, self.level, 2))
-        # LEFT
-        self.platList.append(Platform(0, PLATFORMSIZE/2,
-                                      PLATFORMSIZE, SCREENHEIGHT-PLATFORMSIZE, self.level, -1))
-        # RIGHT
-        self.platList.append(Platform(SCREENWIDTH-PLATFORMSIZE, PLATFORMSIZE/2,
-                                      PLATFORMSIZE, SCREENHEIGHT-PLATFORMSIZE, self.level, 1))
-
-    def readMapFile(self, textfile):
-        return np.loadtxt(textfile, dtype='<U1', comments=None)
-
-    def connectHorizontally(self, data, xoffset=0, yoffset=0):
-        for row in list(range(data.shape[0])):
-            w = 0
-            x = -1
-            y = row*TILEHEIGHT
-            h = PLATFORMSIZE
-            for col in list(range(data.shape[1])):
-                if data[row][col] == self.platSymbol:
-                    if x == -1:
-                        x = col*TILEWIDTH
-                    w += TILEWIDTH
-                    if col + 1 == len(list(range(data.shape[1]))):
-                        self.platList.append(Platform(x, y, w, h, self.level))
-                else:
-                    if x != -1:
-                        self.platList.append(Platform(x, y, w, h, self.level))
-                        x = -1
-                        w = 0
-
-    def connectVertically(self, data):
-        dataT = data.transpose()
-        for col in list(range(dataT.shape[0])):
-
-            for row in list(range(dataT.shape[1])):
-                x = col*TILEWIDTH
-                y = -1
-                h = 0
-                w = PLATFORMSIZE
-                if dataT[col][row] == self.platSymbol:
-                    if y == -1:
-                        y = row*TILEHEIGHT
-                    h += TILEHEIGHT
-                    if row + 1 == len(list(range(dataT.shape[1]))):
-                        self.platList.append(Platform(x, y, w, h, self.level))
-                else:
-                    if y != -1:
-                        self.platList.append(Platform(x, y, w, h, self.level))
-                        y = -1
-                        h = 0
+        levelData = loadLevel(file)
+        for x, y, w, h in levelData.platforms:
+            self.platList.append(Platform(x, y, w, h, self.level))
+        for x, y, w, h, orientation in BORDERS:
+            self.platList.append(Platform(x, y, w, h, self.level, orientation))
+        cellStart, cellPlatforms = levelData.cellIndex
+        cellPlatforms = cellPlatforms.tolist()
+        self.cells = [tuple(cellPlatforms[cellStart[c]:cellStart[c+1]]) for c in range(GRIDROWS*GRIDCOLS)]
+        self.rects = rectArray([plat.rect for plat in self.platList])
+        self.spans = self.buildSpans(ENEMYWIDTH, ENEMYHEIGHT)
+        self.landings = {}
+        self.flowField = FlowField(self)
+
+    def query(self, rect):
+        """Returns the indices of the platforms in the cells `rect` covers, in platList order."""
+        indices = set()
+        for row in getCellRange(rect.y, rect.h, TILEHEIGHT, GRIDROWS):
+            for col in getCellRange(rect.x, rect.w, TILEWIDTH, GRIDCOLS):
+                indices.update(self.cells[row*GRIDCOLS+col])
+        return sorted(indices)
+
+    def near(self, rect):
+        """Returns the platforms `rect` may collide with, in platList order."""
+        return [self.platList[i] for i in self.query(rect)]
+
+    def nearMove(self, getBox):
+        """
+        Yields the platforms a moving rect may collide with, in platList order.
+
+        `getBox` returns the box around the rects being tested. It is called
+        again after each platform, because handling a collision may change the
+        move; if the box grows, the later platforms in the new cells are
+        added, so the result is the same as testing every platform in turn.
+        """
+        box = getBox()
+        indices = self.query(box)
+        k = 0
+        while k < len(indices):
+            yield self.platList[indices[k]]
+            newBox = getBox()
+            if not box.contains(newBox):
+                box = box.union(newBox)
+                indices = indices[:k+1] + [i for i in self.query(box) if i > indices[k]]
+            k += 1
+
+    def buildSpans(self, w, h):
+        """
+        Returns the walkable spans for a walker with a w by h rect: the top
+        of each horizontal platform, with the other platforms that rise into
+        the walker's rect as it walks there and that it turns at.
+        """
+        spans = []
+        for plat in self.platList:
+            if abs(plat.orientation) == 1:
+                continue
+            # The rect of a walker on this platform, truncated like pygame.Rect
+            top = int(plat.y-h)
+            bottom = top+int(h)
+            # A walker steps off an edge before it gets further than its width past it
+            reachLeft = plat.x-2*w
+            reachRight = plat.x+plat.w+2*w
+            walls = [(other.rect.left, other.rect.right) for other in self.platList
+                     if other is not plat and other.rect.left < reachRight and reachLeft < other.rect.right
+                     and other.rect.top < bottom and top < other.rect.bottom]
+            spans.append(WalkSpan(plat, walls))
+        # Sorted from the top down, so the first span a falling walker overlaps is the one it lands on
+        spans.sort(key=lambda span: span.top)
+        return spans
+
+    @staticmethod
+    def findLanding(spans, left, right, top, exclude=None):
+        """
+        Returns the first of spans other than exclude whose platform a walker's
+        rect from left to right, with its top at top, falls onto.
+        """
+        for span in spans:
+            rect = span.platform.rect
+            if span is not exclude and rect.bottom > top and rect.left < right and left < rect.right:
+                return span
+        return None
+
+    def landing(self, x, y, exclude=None, w=ENEMYWIDTH):
+        """Returns the span a walker at x with its top at y falls onto, looked up once per position."""
+        key = (x, y, exclude)
+        if key not in self.landings:
+            # Truncated like the walker's pygame.Rect
+            left = int(x-w/2)
+            self.landings[key] = self.findLanding(self.spans, left, left+int(w), int(y), exclude)
+        return self.landings[key]
 
     def render(self, screen):
         for plat in self.platList:
@@ -0,0 +1,108 @@
+import threading
+import pygame
+from constants import *
+from platforms import PlatformGroup
+from cherries import CherryGroup
+from enemies import EnemyGroup
+from leveldata import LevelLoader
+
+"""
+Builds the objects a round needs, loading the level ahead on a worker thread.
+
+When Bomb Jack clears a round, `GameController.winGame` starts a
+`RoundPreloader` for the next level, which loads its level file while the
+dance animation plays. `startGame` then takes the round, whose objects are
+built on the main thread from the already loaded level.
+"""
+
+
+class PreparedRound(object):
+    """The level-specific objects `GameController.startGame` swaps in.
+
+    Attributes:
+        level (int): The level the round was built for.
+        background (pygame.Surface): The background of the level, or None when the round is not rendered.
+        enemies (EnemyGroup): The enemies of the level, not yet spawned.
+        platforms (PlatformGroup): The platforms of the level.
+        cherries (CherryGroup): The cherries of the level, or None when the current ones are kept.
+        staticLayer (pygame.Surface): The background with the platforms drawn on it, or None
+            when the round is not rendered.
+    """
+    def __init__(self, level, bombjack, bgSheet, cherries=True, render=True):
+        file = LevelLoader.levelFiles()[level]
+        self.level = level
+        self.background = bgSheet.getImage(level) if render else None
+        self.enemies = EnemyGroup(file, bombjack)
+        self.platforms = PlatformGroup(file, level)
+        self.cherries = CherryGroup(file) if cherries else None
+        self.staticLayer = self.createStaticLayer() if render else None
+
+    def createStaticLayer(self):
+        """
+        Composites everything that stays put during a round (the background
+        and the platforms) into one display-format surface, so each frame
+        starts with a single blit.
+        """
+        staticLayer = pygame.Surface(SCREENSIZE).convert()
+        staticLayer.blit(self.background, (0, 0))
+        self.platforms.render(staticLayer)
+        return staticLayer
+
+
+class RoundPreloader(object):
+    """Loads the next round's level on a worker thread.
+
+    The worker only parses the level file and builds its arrays, through
+    `LevelLoader`. Converting surfaces and the sprite caches the round's
+    objects share are not thread-safe, so `take` builds the objects and the
+    static layer on the main thread, from the level the worker left in the
+    loader's cache.
+
+    Only one round is preloaded at a time. If the worker fails, `take` returns
+    None and the round is built on the spot as usual.
+
+    Attributes:
+        level (int): The level being preloaded, or None.
+        bombjack (Bombjack): The Bomb Jack the round's enemies chase.
+        bgSheet (BGSpritesheet): The backgrounds to take the round's from.
+        error (Exception): What the worker raised, if it failed.
+        thread (threading.Thread): The worker thread.
+    """
+    def __init__(self):
+        self.level = None
+        self.bombjack = None
+        self.bgSheet = None
+        self.error = None
+        self.thread = None
+
+    def start(self, level, bombjack, bgSheet):
+        self.level = level
+        self.bombjack = bombjack
+        self.bgSheet = bgSheet
+        self.error = None
+        self.thread = threading.Thread(target=self.run, args=(LevelLoader.levelFiles()[level],), daemon=True)
+        self.thread.start()
+
+    def run(self, file):
+        try:
+            LevelLoader.load(file)
+        except Exception as error:
+            self.error = error
+
+    def take(self, level):
+        """
+        Returns the round for `level` built from the preloaded level, waiting
+        for the worker if it is not done yet, or None if there is none.
+        """
+        if self.thread is None:
+            return None
+        self.thread.join()
+        prepared = None
+        if self.level == level and self.error is None:
+            prepared = PreparedRound(level, self.bombjack, self.bgSheet)
+        self.level = None
+        self.bombjack = None
+        self.bgSheet = None
+        self.error = None
+        self.thread = None
+        return prepared
@@ -0,0 +1,105 @@
+import sys
+import time
+import builtins
+from contextlib import contextmanager
+
+"""Module for measuring where startup time goes.
+
+`profiler` does nothing until it is enabled, which `run.py --profile-startup`
+does before importing the rest of the game. It then records the time spent in
+each import, each pygame subsystem, each asset load and each traced
+constructor, and prints a breakdown once the first frame is on screen.
+"""
+
+
+class StartupProfiler(object):
+    """Collects startup timings.
+
+    Attributes:
+        enabled (bool): Whether timings are being recorded.
+        start (float): When the profiler was created, taken as the start of the process.
+        imports (list): (name, seconds, depth) of each first import, in the order they started.
+        events (dict): Maps a category such as 'subsystem' or 'asset' to a list of (name, seconds).
+        constructors (dict): Maps a class name to [calls, seconds] spent in its constructor.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.start = time.perf_counter()
+        self.imports = []
+        self.events = {}
+        self.constructors = {}
+        self.depth = 0
+        self.originalImport = None
+
+    def enable(self):
+        self.enabled = True
+        self.originalImport = builtins.__import__
+        builtins.__import__ = self.timeImport
+
+    def timeImport(self, name, globals=None, locals=None, fromlist=(), level=0):
+        # Only the first, absolute import of a module does any work
+        if level != 0 or name in sys.modules:
+            return self.originalImport(name, globals, locals, fromlist, level)
+        # Listed where it starts, so parents come before children and siblings keep their order
+        index = len(self.imports)
+        self.imports.append(None)
+        self.depth += 1
+        start = time.perf_counter()
+        try:
+            return self.originalImport(name, globals, locals, fromlist, level)
+        finally:
+            self.depth -= 1
+            self.imports[index] = (name, time.perf_counter()-start, self.depth)
+
+    @contextmanager
+    def timed(self, category, name):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.events.setdefault(category, []).append((name, time.perf_counter()-start))
+
+    def traceConstructors(self, classes):
+        """Wraps the constructor of each class to count its calls and time them."""
+        if not self.enabled:
+            return
+        for cls in classes:
+            init = cls.__dict__.get('__init__')
+            if init is None:
+                continue
+            setattr(cls, '__init__', self.wrapConstructor(cls.__name__, init))
+
+    def wrapConstructor(self, name, init):
+        def traced(obj, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                init(obj, *args, **kwargs)
+            finally:
+                entry = self.constructors.setdefault(name, [0, 0.0])
+                entry[0] += 1
+                entry[1] += time.perf_counter()-start
+        traced.__wrapped__ = init
+        return traced
+
+    def report(self):
+        lines = [f"Startup profile: {(time.perf_counter()-self.start)*1000:.1f} ms to first frame", ""]
+        lines.append("Imports (cumulative, nested imports indented):")
+        for name, seconds, depth in self.imports:
+            lines.append(f"  {seconds*1000:8.2f} ms  {'  '*depth}{name}")
+        for category, events in self.events.items():
+            lines.append("")
+            lines.append(f"{category.capitalize()}s:")
+            for name, seconds in events:
+                lines.append(f"  {seconds*1000:8.2f} ms  {name}")
+            lines.append(f"  {sum(seconds for _, seconds in events)*1000:8.2f} ms  total")
+        lines.append("")
+        lines.append("Constructors (inclusive of nested constructors):")
+        for name, (calls, seconds) in sorted(self.constructors.items(), key=lambda item: -item[1][1]):
+            lines.append(f"  {seconds*1000:8.2f} ms  {calls:5d} x {name}")
+        return "\n".join(lines)
+
+
+profiler = StartupProfiler()
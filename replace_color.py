@@ -1,30 +1,63 @@
 import pygame
+import numpy as np
 
 """
 
     Helper functions that replace one color with another in a surface.
 
+    Every function accepts either a single surface or a batch (list/tuple) of
+    surfaces, and works on the pixel array in place using NumPy masks.
+
     Inspired by kevintodisco on Game Development Stack Exchange:
     https://gamedev.stackexchange.com/questions/26550/how-can-a-pygame-image-be-colored
 """
 
-# Replaces color c1 with c2
-def replace_color(surface, c1, c2):
-    arr = pygame.surfarray.pixels3d(surface)
-    for row in arr:
-        for p in row:
-            if (p[0], p[1], p[2]) == c1:
-                (p[0], p[1], p[2]) = c2
-
 
 transcolor = (186, 252, 202)
 
 
+def _surfaces(surface):
+    if isinstance(surface, pygame.Surface):
+        return (surface,)
+    return surface
+
+
+# Packs an RGB color into one integer so a pixel matches with a single compare
+def _pack(color):
+    r, g, b = tuple(color)[:3]
+    return (r << 16) | (g << 8) | b
+
+
+def _packPixels(arr):
+    return (arr[..., 0].astype(np.uint32) << 16) | (arr[..., 1].astype(np.uint32) << 8) | arr[..., 2]
+
+
+# Replaces color c1 with c2
+def replace_color(surface, c1, c2):
+    replace_colors(surface, [(c1, c2)])
+
+
+# Applies several substitutions in one pass. palette is a dict or a sequence of
+# (old, new) pairs; pixels are matched against their original color, so a
+# substitution never feeds into a later one, and the first matching pair wins.
+def replace_colors(surface, palette):
+    pairs = list(palette.items()) if isinstance(palette, dict) else list(palette)
+    for s in _surfaces(surface):
+        arr = pygame.surfarray.pixels3d(s)
+        packed = _packPixels(arr)
+        taken = np.zeros(packed.shape, dtype=bool)
+        for old, new in pairs:
+            mask = packed == _pack(old)
+            mask &= ~taken
+            arr[mask] = tuple(new)[:3]
+            taken |= mask
+        del arr
+
+
 # Replaces all non-transparent colors with c
 def replace_all_colors(surface, c):
-    arr = pygame.surfarray.pixels3d(surface)
-    for row in arr:
-        for p in row:
-            # If it is not transparent
-            if (p[0], p[1], p[2]) != transcolor:
-                (p[0], p[1], p[2]) = c
+    for s in _surfaces(surface):
+        arr = pygame.surfarray.pixels3d(s)
+        # If it is not transparent
+        arr[_packPixels(arr) != _pack(transcolor)] = tuple(c)[:3]
+        del arr
@@ -1,14 +1,26 @@
+import sys
+import time
+from profiler import profiler
+# Enabled before the other imports so that they are timed too
+if __name__ == "__main__" and '--profile-startup' in sys.argv:
+    profiler.enable()
+
 import pygame
-from math import floor
+import argparse
+import numpy as np
 from pygame.locals import *
 from constants import *
 from bombjack import Bombjack
-from platforms import PlatformGroup
-from cherries import CherryGroup
+from platforms import PlatformGroup, Platform
+from cherries import CherryGroup, Cherry
 from coins import PowerCoin
-from sprites import BGSpritesheet
-from enemies import EnemyGroup, Mummy, Club, Bird
-from text import TextGroup
+from sprites import BGSpritesheet, SpriteAtlas
+from enemies import EnemyGroup, Enemy, Mummy, Club, Bird, UFO, Orb, Sphere
+from text import TextGroup, Text
+from leveldata import LevelLoader
+from preload import PreparedRound, RoundPreloader
+from music import Music
+from collisions import circleHits
 
 
 class GameController(object):
@@ -16,13 +28,42 @@ class GameController(object):
     Controls the overall game flow and mechanics, including player movement, 
     enemies, platforms, power-ups, and rendering. Manages game state, levels, 
     rounds, and the main game loop.
+
+    With `dirtyRects` set, each frame only restores and redraws the regions
+    that sprites and text covered on the last frame or cover on this one,
+    and only those regions are pushed to the display. With `preloadMusic`
+    set, the music is decoded into memory at startup instead of streamed.
+
+    With `headless` set, no window, audio or static layer is set up, the high
+    score file is never written, and the game is only advanced through `step`
+    (see headless.py).
+
+    The simulation advances in fixed steps of TIMESTEP seconds. `update` adds
+    the real time that passed to an accumulator and runs as many steps as fit,
+    up to MAXSTEPS, then renders once; so the same inputs per step always give
+    the same game state, however fast frames come. Time up to TICKSLACK short
+    of a step is counted as a whole one, so the millisecond ticks of a clock
+    running at the step rate give one step every frame.
+
+    With `enemyArrays` set, the chasing enemies are updated as NumPy arrays
+    (see enemyarrays.py).
     """
-    def __init__(self):
-        pygame.init()
+    def __init__(self, dirtyRects=False, preloadMusic=MUSICPRELOAD, headless=False, enemyArrays=ENEMYARRAYS):
+        self.headless = headless
+        self.enemyArrays = enemyArrays
+        self.initSubsystems()
         self.screen = pygame.Surface(SCREENSIZE)
-        self.screen2 = pygame.display.set_mode((SCREENWIDTH, SCREENHEIGHT+4*TILEHEIGHT), depth=32)
+        if headless:
+            self.screen2 = None
+        else:
+            with profiler.timed('subsystem', 'display mode'):
+                self.screen2 = pygame.display.set_mode((SCREENWIDTH, SCREENHEIGHT+4*TILEHEIGHT), depth=32)
         self.background = None
+        self.staticLayer = None
         self.clock = pygame.time.Clock()
+        self.accumulator = 0
+        # Events read on frames that were too short for a step
+        self.pendingEvents = []
         self.bombjack = Bombjack()
         self.powerCoin = PowerCoin(self.bombjack)
         # Should start at 0
@@ -30,6 +71,11 @@ class GameController(object):
         # Should start at 1
         self.round = 1
         self.bgSheet = BGSpritesheet()
+        self.preloader = RoundPreloader()
+        # Opened by its first play, in startGame
+        self.music = Music(preload=preloadMusic)
+        # Use the compiled level bundle when there is one
+        LevelLoader.loadBundle()
         self.textgroup = TextGroup()
         self.score = 0
         self.livesImage = self.bombjack.sprites.getStartImage()
@@ -39,22 +85,46 @@ class GameController(object):
         self.pauseTimer = 0
         self.pauseTime = 1
         self.paused = False
+        self.dirtyRects = dirtyRects
+        # Regions drawn last frame, in screen2 coordinates
+        self.spriteRects = []
+        self.hudRects = []
+        self.fullRedraw = True
 
-    def setBackground(self):
-        self.background = self.bgSheet.getImage(self.level)
+    def initSubsystems(self):
+        """Initializes only the pygame modules the game uses, instead of `pygame.init()`."""
+        with profiler.timed('subsystem', 'font'):
+            pygame.font.init()
+        if self.headless:
+            return
+        with profiler.timed('subsystem', 'display'):
+            pygame.display.init()
+        with profiler.timed('subsystem', 'mixer'):
+            try:
+                pygame.mixer.init()
+            except pygame.error:
+                # Play without music when there is no audio device
+                pass
 
     def startGame(self, cherries=True):
-        self.setBackground()
-        file = f'levels/level{self.level}.txt'
-        self.enemies = EnemyGroup(file, self.bombjack)
-        self.platforms = PlatformGroup(file, self.level)
+        # Use the round preloaded during the dance if there is one
+        prepared = self.preloader.take(self.level)
+        if prepared is None:
+            prepared = PreparedRound(self.level, self.bombjack, self.bgSheet, cherries,
+                                     render=not self.headless)
+        self.background = prepared.background
+        self.enemies = prepared.enemies
+        self.enemies.arrays = self.enemyArrays
+        self.platforms = prepared.platforms
+        self.staticLayer = prepared.staticLayer
         if cherries:
-            self.cherries = CherryGroup(file)
+            self.cherries = prepared.cherries
         else:
             # Reset the lit cherry
             if self.cherries.hasLitCherry:
                 self.cherries.cherryList[0].isLit = False
                 self.cherries.hasLitCherry = False
+        self.fullRedraw = True
         self.powerCoin.visible = False
         self.powerCoin.x = int(NCOLS/2)*TILEWIDTH
         self.powerCoin.y = int(NROWS/2)*TILEHEIGHT
@@ -66,32 +136,68 @@ class GameController(object):
 
         self.textgroup.updateRound(self.round)
 
-        pygame.mixer.music.load('ladymadonna.mp3')
-        pygame.mixer.music.play(-1)
+        self.music.play()
 
         # Pause the game for a bit
         self.paused = True
 
     def update(self):
-        dt = self.clock.tick(30) / 1000.0
+        frameTime = self.clock.tick(1/TIMESTEP) / 1000.0
+        self.accumulator = min(self.accumulator + frameTime, MAXSTEPS*TIMESTEP)
+        keys = pygame.key.get_pressed()
+        self.pendingEvents += pygame.event.get()
+        # A tick of 33 ms is short of a 1/30 s step, but still runs one
+        while self.accumulator >= TIMESTEP-TICKSLACK:
+            # Events are handled once, on the first step
+            events, self.pendingEvents = self.pendingEvents, []
+            self.step(TIMESTEP, keys, events)
+            self.accumulator = max(self.accumulator-TIMESTEP, 0)
+        self.render()
+
+    def step(self, dt, keys=None, events=None):
+        """
+        Advances the game by `dt` seconds without drawing anything.
+
+        `keys` stands in for `pygame.key.get_pressed()` and `events` for the
+        event queue; by default both are read from pygame.
+        """
         if not self.paused:
-            pts = self.bombjack.update(dt, self.platforms.platList)
+            pts = self.bombjack.update(dt, self.platforms, keys)
             self.updateScore(pts)
-            self.enemies.update(dt, self.platforms.platList)
-            self.powerCoin.update(dt, self.platforms.platList)
+            self.enemies.update(dt, self.platforms)
+            self.powerCoin.update(dt, self.platforms)
             self.cherries.update(dt)
             self.textgroup.update(dt)
-            self.checkCherryEvents()
-            self.checkSpriteEvents()
-            self.checkEnemyEvents()
-            self.checkCoinEvents()
+            hits = self.findCollisions()
+            self.checkCherryEvents(hits)
+            if self.checkSpriteEvents():
+                # The round restarted, so everything moved
+                hits = self.findCollisions()
+            self.checkEnemyEvents(hits)
+            self.checkCoinEvents(hits)
         else:
             self.pauseTimer += dt
             if self.pauseTimer >= self.pauseTime:
                 self.pauseTimer = 0
                 self.paused = False
-        self.checkEvents()
-        self.render()
+        self.checkEvents(events)
+
+    def snapshot(self):
+        """
+        Returns the game state that steps change, to compare runs for determinism.
+
+        Positions are given as floats and flags as bools, so the same state has
+        the same repr whether an enemy's fields were last written as ints by its
+        own update or as floats by its `EnemyArrays` store.
+        """
+        bombjack = self.bombjack
+        return (self.round, self.level, self.score, self.lives, self.paused, float(self.pauseTimer),
+                (float(bombjack.x), float(bombjack.y), float(bombjack.vy), bool(bombjack.jumped),
+                 bool(bombjack.gliding), bool(bombjack.dancing), bool(bombjack.dying), bool(bombjack.poweredUp)),
+                [(float(cherry.x), float(cherry.y), bool(cherry.isLit)) for cherry in self.cherries.cherryList],
+                [(type(enemy).__name__, float(enemy.x), float(enemy.y), bool(enemy.frozen), bool(enemy.friendly))
+                 for enemy in self.enemies.enemyList],
+                (float(self.powerCoin.x), float(self.powerCoin.y), bool(self.powerCoin.visible)))
 
     def updateScore(self, points):
         self.score += points
@@ -104,7 +210,10 @@ class GameController(object):
         self.powerCoin.visible = False
         self.bombjack.dancing = True
         self.round += 1
-        self.level = (self.round-1) % NUMLEVELS
+        self.level = (self.round-1) % len(LevelLoader.levelFiles())
+        # Load the next level while Bomb Jack dances
+        if not self.headless:
+            self.preloader.start(self.level, self.bombjack, self.bgSheet)
 
         # Lit cherry bonus
         if self.cherries.litCount >= 20:
@@ -119,7 +228,41 @@ class GameController(object):
         self.bombjack.dying = True
         self.lives -= 1
 
+    def findCollisions(self):
+        """
+        Tests Bomb Jack against every cherry, enemy and the power coin at once.
+
+        Returns the hit events in a stable order, as (kind, object) pairs: the
+        first cherry hit in cherryList order, then every enemy hit in
+        enemyList order, then the coin. Whether a hit counts (e.g. the coin
+        being visible) is decided when the event is applied.
+        """
+        cherries = self.cherries.circles
+        if len(cherries) != len(self.cherries.cherryList):
+            cherries = self.cherries.circles = self.cherries.getCircles()
+        enemyList = self.enemies.enemyList
+        enemies = np.array([(enemy.x, enemy.y, enemy.collideRadius) for enemy in enemyList],
+                           dtype=np.float64).reshape(-1, 3)
+        coin = np.array([(self.powerCoin.x, self.powerCoin.y, self.powerCoin.collideRadius)], dtype=np.float64)
+        bombjack = self.bombjack
+        hits = circleHits(bombjack.x, bombjack.y, bombjack.collideRadius, np.concatenate([cherries, enemies, coin]))
+
+        events = []
+        cherryHit = False
+        for i in np.flatnonzero(hits).tolist():
+            if i < len(cherries):
+                # Bomb Jack eats one cherry at a time
+                if not cherryHit:
+                    events.append(('cherry', self.cherries.cherryList[i]))
+                    cherryHit = True
+            elif i < len(cherries)+len(enemies):
+                events.append(('enemy', enemyList[i-len(cherries)]))
+            else:
+                events.append(('coin', self.powerCoin))
+        return events
+
     def checkSpriteEvents(self):
+        """Restarts the round once Bomb Jack is done dying or dancing, and returns whether it did."""
         if self.bombjack.sprites.doneDying:
             self.bombjack.sprites.doneDying = False
             # Don't reset the cherries if we still have lives
@@ -131,16 +274,20 @@ class GameController(object):
                 self.round = 1
                 self.updateScore(-self.score)
                 self.lives = NUMLIVES
-                # Update high score
-                self.textgroup.setHighScore()
+                # Update high score, unless this is a simulated game
+                if not self.headless:
+                    self.textgroup.setHighScore()
 
                 self.startGame()
+            return True
         elif self.bombjack.sprites.doneDancing:
             self.bombjack.sprites.doneDancing = False
             self.startGame()
+            return True
+        return False
 
-    def checkCherryEvents(self):
-        cherry = self.bombjack.eatCherries(self.cherries.cherryList)
+    def checkCherryEvents(self, hits):
+        cherry = next((hit for kind, hit in hits if kind == 'cherry'), None)
         # The amount to be added to the count for this cherry
         pCount = 0
         if cherry:
@@ -161,7 +308,7 @@ class GameController(object):
             self.textgroup.addText(str(score), WHITE, cherry.x -
                                    cherry.collideRadius, cherry.y+6*cherry.collideRadius, 10, time=TEXTTIME)
 
-            self.cherries.cherryList.remove(cherry)
+            self.cherries.remove(cherry)
             # Spawn the P if we have eaten enough cherries
             if self.cherries.numEaten >= 20:
                 self.cherries.numEaten = 0
@@ -170,39 +317,48 @@ class GameController(object):
             if self.cherries.isEmpty():
                 self.winGame()
 
-    def checkCoinEvents(self):
+    def checkCoinEvents(self, hits):
         # If bombjack collects the P
-        if self.powerCoin.visible and self.bombjack.collideCheck(self.powerCoin):
+        if self.powerCoin.visible and any(kind == 'coin' for kind, _ in hits):
             self.powerCoin.visible = False
             self.bombjack.poweredUp = True
             self.enemy_index = 0
             self.enemies.freeze()
 
-    def checkEnemyEvents(self):
-        for i, enemy in enumerate(self.enemies.enemyList):
-            if self.bombjack.collideCheck(enemy):
-                # If enemy is a coin
-                if enemy.frozen:
-                    self.enemies.enemyList.pop(i)
-                    self.enemies.respawn(enemy)
-                    self.updateScore(self.enemy_scores[self.enemy_index])
-                    self.textgroup.addText(str(self.enemy_scores[self.enemy_index]), WHITE, enemy.x-enemy.w/2,
-                                           enemy.y+5/2*enemy.h, 10, time=TEXTTIME)
-                    if self.enemy_index < len(self.enemy_scores)-1:
-                        self.enemy_index += 1
-                elif not enemy.friendly:
-                    self.loseGame()
-            # If a mummy touches the ground, make it transform
-            if isinstance(enemy, Mummy) and enemy.platform == self.platforms.platList[len(self.platforms.platList)-3]:
+    def checkEnemyEvents(self, hits):
+        enemyList = self.enemies.enemyList
+        for kind, enemy in hits:
+            # Skip enemies cleared since the hits were found, when the round was won
+            if kind != 'enemy' or enemy not in enemyList:
+                continue
+            # If enemy is a coin
+            if enemy.frozen:
+                enemyList.remove(enemy)
+                self.enemies.respawn(enemy)
+                self.updateScore(self.enemy_scores[self.enemy_index])
+                self.textgroup.addText(str(self.enemy_scores[self.enemy_index]), WHITE, enemy.x-enemy.w/2,
+                                       enemy.y+5/2*enemy.h, 10, time=TEXTTIME)
+                if self.enemy_index < len(self.enemy_scores)-1:
+                    self.enemy_index += 1
+            elif not enemy.friendly:
+                # Clears the enemies, so no other hit counts
+                self.loseGame()
+                break
+        # If a mummy touches the ground, make it transform
+        bottom = self.platforms.platList[len(self.platforms.platList)-3]
+        for i, enemy in enumerate(enemyList):
+            if isinstance(enemy, Mummy) and enemy.span is not None and enemy.span.platform == bottom:
                 next = enemy.get_next(enemy.x, enemy.y)
                 next.friendly = True
                 next.safeImage = next.sprites.getImage(3.5, 8)
 
                 # Add new enemy to enemyList
-                self.enemies.enemyList[i] = next
+                enemyList[i] = next
 
-    def checkEvents(self):
-        for event in pygame.event.get():
+    def checkEvents(self, events=None):
+        if events is None:
+            events = pygame.event.get()
+        for event in events:
             if event.type == QUIT:
                 exit()
             if event.type == KEYDOWN:
@@ -215,13 +371,31 @@ class GameController(object):
                         self.bombjack.jumped = True
                         self.updateScore(10)
 
+    def renderSprites(self):
+        """Draws everything that moves onto the play area and returns the rects covered."""
+        rects = self.cherries.render(self.screen)
+        rects += self.enemies.render(self.screen)
+        rects.append(self.powerCoin.render(self.screen))
+        rects.append(self.bombjack.render(self.screen))
+        return [rect for rect in rects if rect is not None]
+
+    def renderLives(self):
+        rects = []
+        for i in range(self.lives-1):
+            rects.append(self.screen2.blit(self.livesImage,
+                                           (i*TILEWIDTH*SPRITEFACTOR, SCREENHEIGHT+2*TILEHEIGHT)))
+        return rects
+
+    def getLivesRects(self):
+        return [self.livesImage.get_rect(topleft=(i*TILEWIDTH*SPRITEFACTOR, SCREENHEIGHT+2*TILEHEIGHT))
+                for i in range(self.lives-1)]
+
     def render(self):
-        self.screen.blit(self.background, (0, 0))
-        self.platforms.render(self.screen)
-        self.cherries.render(self.screen)
-        self.enemies.render(self.screen)
-        self.powerCoin.render(self.screen)
-        self.bombjack.render(self.screen)
+        if self.dirtyRects and not self.fullRedraw:
+            self.renderDirty()
+            return
+        self.screen.blit(self.staticLayer, (0, 0))
+        spriteRects = self.renderSprites()
 
         # Draw grid
         # for i in range(NROWS):
@@ -229,17 +403,75 @@ class GameController(object):
         # for i in range(NCOLS):
         #     pygame.draw.line(self.screen, WHITE, (TILEWIDTH*i, 0), (TILEWIDTH*i, SCREENHEIGHT))
 
-        self.screen2.fill(BLACK)
+        self.textgroup.renderHUD(self.screen2)
+        self.textgroup.popHUDChanges()
         self.screen2.blit(self.screen, (0, 2*TILEHEIGHT))
         self.textgroup.render(self.screen2)
-        for i in range(self.lives-1):
-            self.screen2.blit(self.livesImage,
-                              (i*TILEWIDTH*SPRITEFACTOR, SCREENHEIGHT+2*TILEHEIGHT))
+        self.renderLives()
         pygame.display.update()
 
+        self.spriteRects = [rect.move(0, 2*TILEHEIGHT) for rect in spriteRects]
+        self.hudRects = self.textgroup.getRects() + self.getLivesRects()
+        self.fullRedraw = False
+
+    def renderDirty(self):
+        """
+        Redraws only what changed since the last frame.
+
+        The sprites' old rects are restored from the static layer before the
+        sprites are drawn again. On screen2, every old and new sprite, floating
+        text and lives rect, plus any HUD text that changed, is restored from the
+        HUD strips and refilled from the play area. Then the floating text and
+        lives are drawn on top, since each of them lies inside a restored rect.
+        """
+        offset = 2*TILEHEIGHT
+        for rect in self.spriteRects:
+            area = rect.move(0, -offset)
+            self.screen.blit(self.staticLayer, area, area)
+        spriteRects = [rect.move(0, offset) for rect in self.renderSprites()]
+        hudRects = self.textgroup.getRects() + self.getLivesRects()
+
+        changed = self.spriteRects + spriteRects + self.hudRects + hudRects + self.textgroup.popHUDChanges()
+        for rect in changed:
+            self.textgroup.restoreHUD(self.screen2, rect)
+            self.screen2.blit(self.screen, rect, rect.move(0, -offset))
+        self.textgroup.render(self.screen2)
+        self.renderLives()
+        pygame.display.update(changed)
+
+        self.spriteRects = spriteRects
+        self.hudRects = hudRects
+
 
 if __name__ == "__main__":
-    game = GameController()
-    game.startGame()
+    parser = argparse.ArgumentParser(description="Bomb Jack")
+    parser.add_argument('--dirty-rects', action='store_true',
+                        help="only redraw and update the screen regions that change each frame")
+    parser.add_argument('--preload-music', action='store_true', default=MUSICPRELOAD,
+                        help="decode the music into memory once instead of streaming it from disk")
+    parser.add_argument('--enemy-arrays', action='store_true', default=ENEMYARRAYS,
+                        help="update the chasing enemies as NumPy arrays, for levels with hundreds of enemies")
+    parser.add_argument('--profile-startup', action='store_true',
+                        help="print where the time to the first frame went, then exit")
+    args = parser.parse_args()
+    if args.profile_startup:
+        profiler.traceConstructors([GameController, Bombjack, PowerCoin, BGSpritesheet, SpriteAtlas,
+                                    TextGroup, Text, PlatformGroup, Platform, CherryGroup, Cherry,
+                                    EnemyGroup, Enemy, Mummy, Club, Bird, UFO, Orb, Sphere, PreparedRound])
+    # The background and the music are loaded on first use, by the first round
+    with profiler.timed('phase', 'GameController()'):
+        game = GameController(dirtyRects=args.dirty_rects, preloadMusic=args.preload_music,
+                              enemyArrays=args.enemy_arrays)
+    with profiler.timed('phase', 'first round'):
+        game.startGame()
+    if args.profile_startup:
+        game.render()
+        print(profiler.report())
+        # What initSubsystems saves by not calling pygame.init()
+        start = time.perf_counter()
+        pygame.init()
+        print(f"\nSkipped by selective init: starting the other pygame modules takes "
+              f"{(time.perf_counter()-start)*1000:.2f} ms")
+        sys.exit()
     while True:
         game.update()
@@ -1,8 +1,15 @@
+import os
+import io
+import mmap
+import hashlib
 import pygame
 from constants import *
 import numpy as np
 from animation import Animator
 from constants import SPRITESHEET_FILE
+from replace_color import replace_all_colors, replace_colors
+from profiler import profiler
+from cachefiles import writeCacheFile
 
 """Module for extracting sprites from a spritesheet.
 """
@@ -12,12 +19,161 @@ BASETILEHEIGHT = 20/SPRITEFACTOR
 
 BGTILESIZE = 224
 
+ATLASMAGIC = b'BJAT'
+# Magic bytes, then the scaled and the source width and height as uint32s
+ATLASHEADERSIZE = len(ATLASMAGIC)+16
+
+
+def loadScaledImage(filename, getSize, params):
+    """
+    Returns filename decoded and scaled to getSize(sourceSize), and its source size.
+
+    When ATLASCACHE is set, the scaled pixels are kept in CACHEDIR in a raw file
+    named after the hash of the source file and of params, the values that
+    determine the scaling. Later loads memory-map that file and wrap it with
+    `pygame.image.frombuffer` instead of decoding and scaling the image again.
+    The result is converted to the display format when there is a display.
+    """
+    with open(filename, 'rb') as f:
+        source = f.read()
+    digest = hashlib.sha1(source + repr(params).encode()).hexdigest()
+    cachefile = os.path.join(CACHEDIR, f"{os.path.basename(filename)}.{digest[:16]}.atlas")
+    cached = None
+    if ATLASCACHE:
+        with profiler.timed('asset', f"{os.path.basename(filename)} (scaled cache)"):
+            cached = readScaledCache(cachefile)
+    if cached is not None:
+        image, sourceSize = cached
+    else:
+        with profiler.timed('asset', f"{os.path.basename(filename)} (decode and scale)"):
+            image = pygame.image.load(io.BytesIO(source), filename)
+            sourceSize = image.get_size()
+            image = pygame.transform.scale(image, getSize(sourceSize))
+        if ATLASCACHE:
+            writeScaledCache(cachefile, image, sourceSize)
+    if pygame.display.get_surface() is not None:
+        image = image.convert()
+    return image, sourceSize
+
+
+def readScaledCache(cachefile):
+    try:
+        with open(cachefile, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if mm[:len(ATLASMAGIC)] != ATLASMAGIC:
+                return None
+            header = np.frombuffer(mm, dtype='<u4', count=4, offset=len(ATLASMAGIC)).tolist()
+            width, height, sourceWidth, sourceHeight = header
+            if len(mm) != ATLASHEADERSIZE+width*height*4:
+                return None
+            view = memoryview(mm)
+            buffered = pygame.image.frombuffer(view[ATLASHEADERSIZE:], (width, height), 'RGBX')
+            # Copy out of the mapping so the file can be closed
+            image = buffered.copy()
+            del buffered
+            view.release()
+    except (OSError, ValueError):
+        return None
+    return image, (sourceWidth, sourceHeight)
+
+
+def writeScaledCache(cachefile, image, sourceSize):
+    def write(f):
+        f.write(ATLASMAGIC)
+        f.write(np.array(image.get_size() + sourceSize, dtype='<u4').tobytes())
+        f.write(pygame.image.tostring(image, 'RGBX'))
+    writeCacheFile(cachefile, write)
+
+
+class SpriteAtlas(object):
+    """The scaled spritesheet shared by every `Spritesheet` in the process.
+
+    Loading and scaling the full sheet is expensive, so it is done once per
+    file and every sprite object keeps a reference to the same surface.
+
+    Attributes:
+        sheet (pygame.Surface): The loaded and scaled spritesheet image.
+        frames (dict): Subsurfaces of the sheet keyed by their (x, y, w, h) rect.
+        flippedFrames (dict): Horizontally mirrored frames, keyed like `frames`.
+        variants (dict): Recolored copies of frames, keyed by (frame, palette).
+        sourceSize (tuple): The size of the sheet before scaling.
+    """
+    atlases = {}
+
+    def __init__(self, filename=SPRITESHEET_FILE):
+        self.sheet, self.sourceSize = loadScaledImage(filename, self.getScaledSize,
+                                                      (SPRITEFACTOR, TILEWIDTH, TILEHEIGHT))
+        transcolor = self.sheet.get_at((0, 0))
+        self.sheet.set_colorkey(transcolor)
+        self.frames = {}
+        self.flippedFrames = {}
+        self.variants = {}
+
+    def getFrame(self, x, y, width, height):
+        """Returns the subsurface at the given rect, slicing it on first use."""
+        key = (x, y, width, height)
+        frame = self.frames.get(key)
+        if frame is None:
+            rect = pygame.Rect(x, y, width, height).clip(self.sheet.get_rect())
+            frame = self.sheet.subsurface(rect)
+            self.frames[key] = frame
+        return frame
+
+    def getFlippedFrame(self, x, y, width, height):
+        """Returns the mirrored frame at the given rect, building it on first use."""
+        key = (x, y, width, height)
+        frame = self.flippedFrames.get(key)
+        if frame is None:
+            frame = pygame.transform.flip(self.getFrame(x, y, width, height), True, False)
+            frame.set_colorkey(frame.get_at((0, 0)))
+            self.flippedFrames[key] = frame
+        return frame
+
+    def getTinted(self, image, color):
+        """Returns image with every non-transparent pixel set to color, built once."""
+        key = (image, tuple(color))
+        variant = self.variants.get(key)
+        if variant is None:
+            variant = image.copy()
+            replace_all_colors(variant, color)
+            self.variants[key] = variant
+        return variant
+
+    def getRecolored(self, image, palette):
+        """Returns image with the (old, new) color pairs in palette substituted, built once."""
+        key = (image, tuple((tuple(old), tuple(new)) for old, new in palette))
+        variant = self.variants.get(key)
+        if variant is None:
+            variant = image.copy()
+            replace_colors(variant, palette)
+            self.variants[key] = variant
+        return variant
+
+    def getSourceColor(self, x, y):
+        """Returns the color at (x, y) of the sheet as it was before scaling."""
+        width, height = self.sourceSize
+        x = -(-x * self.sheet.get_width() // width)
+        y = -(-y * self.sheet.get_height() // height)
+        return self.sheet.get_at((x, y))
+
+    @staticmethod
+    def getScaledSize(sourceSize):
+        width = int(sourceSize[0] / BASETILEWIDTH * TILEWIDTH)
+        height = int(sourceSize[1] / BASETILEHEIGHT * TILEHEIGHT)
+        return (width, height)
+
+    @classmethod
+    def get(cls, filename=SPRITESHEET_FILE):
+        """Returns the atlas for filename, loading it on first use."""
+        if filename not in cls.atlases:
+            cls.atlases[filename] = cls(filename)
+        return cls.atlases[filename]
+
 
 class Spritesheet(object):
     """A class for extracting and manipulating sprites from a spritesheet.
 
     Attributes:
-        sheet (pygame.Surface): The loaded and processed spritesheet image.
+        atlas (SpriteAtlas): The shared atlas that frames are taken from.
         startImage (pygame.Surface): The initial image of the sphere.
         animations (dict): A dictionary of animations for the sphere.
         stopimage (pygame.Surface): The static image of the sphere.
@@ -25,43 +181,50 @@ class Spritesheet(object):
     Methods:
         getStartImage(self)
         getImage(self, x, y)
+        getFlippedImage(self, x, y)
         defineAnimations(self)
         update(self, dt)
         reset(self)
     """
     def __init__(self):
-        self.sheet = pygame.image.load(SPRITESHEET_FILE).convert()
-        transcolor = self.sheet.get_at((0, 0))
-        # print(transcolor)
-        self.sheet.set_colorkey(transcolor)
-        width = int(self.sheet.get_width() / BASETILEWIDTH * TILEWIDTH)
-        height = int(self.sheet.get_height() / BASETILEHEIGHT * TILEHEIGHT)
-        self.sheet = pygame.transform.scale(self.sheet, (width, height))
+        self.atlas = SpriteAtlas.get()
 
     def getImage(self, x, y, width, height):
-        x *= TILEWIDTH
-        y *= TILEHEIGHT
-        self.sheet.set_clip(pygame.Rect(x, y, width, height))
-        return self.sheet.subsurface(self.sheet.get_clip())
+        return self.atlas.getFrame(x * TILEWIDTH, y * TILEHEIGHT, width, height)
+
+    def getFlippedImage(self, x, y, width, height):
+        return self.atlas.getFlippedFrame(x * TILEWIDTH, y * TILEHEIGHT, width, height)
 
 
 class BGSpritesheet(object):
     """A class for handling background sprites from a spritesheet.
 
+    The spritesheet is only loaded when the first background is asked for, so
+    runs that never draw anything never load it.
+
     Attributes:
-        sheet (pygame.Surface): The loaded and processed background spritesheet image.
+        sheet (pygame.Surface): The loaded and processed background spritesheet image, or None until then.
     """
     def __init__(self):
-        self.sheet = pygame.image.load("spritesheets/spritesheet_background.png").convert()
-        width = int(self.sheet.get_width()/BGTILESIZE*SCREENWIDTH)
-        height = int(self.sheet.get_height()/BGTILESIZE*SCREENHEIGHT)
-        self.sheet = pygame.transform.scale(self.sheet, (width, height))
+        self.sheet = None
+
+    def load(self):
+        if self.sheet is None:
+            self.sheet, _ = loadScaledImage("spritesheets/spritesheet_background.png", self.getScaledSize,
+                                            (BGTILESIZE, SCREENWIDTH, SCREENHEIGHT))
+
+    @staticmethod
+    def getScaledSize(sourceSize):
+        width = int(sourceSize[0]/BGTILESIZE*SCREENWIDTH)
+        height = int(sourceSize[1]/BGTILESIZE*SCREENHEIGHT)
+        return (width, height)
 
     def getImage(self, n):
+        self.load()
         x = (n % 5)*SCREENWIDTH
         y = 0
-        self.sheet.set_clip(pygame.Rect(x, y, SCREENWIDTH, SCREENHEIGHT))
-        return self.sheet.subsurface(self.sheet.get_clip())
+        # A subsurface, without setting a clip on the shared sheet
+        return self.sheet.subsurface(pygame.Rect(x, y, SCREENWIDTH, SCREENHEIGHT))
 
 
 class CoinSprites(Spritesheet):
@@ -124,8 +287,6 @@ class CherrySprites(Spritesheet):
 class BombjackSprites(Spritesheet):
     def __init__(self, bombjack):
         Spritesheet.__init__(self)
-        transcolor = self.sheet.get_at((0, 0))
-        self.sheet.set_colorkey(transcolor)
         self.bombjack = bombjack
         self.bombjack.image = self.getStartImage()
         self.stopimage = self.getStartImage()
@@ -230,8 +391,6 @@ class BombjackSprites(Spritesheet):
 class MummySprites(Spritesheet):
     def __init__(self, enemy):
         Spritesheet.__init__(self)
-        transcolor = self.sheet.get_at((0, 0))
-        self.sheet.set_colorkey(transcolor)
 
         self.enemy = enemy
         self.startImage = self.getImage(0, 1)
@@ -252,6 +411,12 @@ class MummySprites(Spritesheet):
     def getImage(self, x, y):
         return Spritesheet.getImage(self, SPRITEFACTOR*x, SPRITEFACTOR*y, SPRITEFACTOR*TILEWIDTH, SPRITEFACTOR*TILEHEIGHT)
 
+    def getSafeImage(self):
+        # Color shifting the poof to blue
+        color = self.atlas.getSourceColor
+        palette = [(color(49, 171), BLUE), (color(41, 171), WHITE), (color(42, 171), RED)]
+        return self.atlas.getRecolored(self.getImage(2, 8), palette)
+
     def defineAnimations(self):
         right_imgs = []
         left_imgs = []
@@ -286,8 +451,6 @@ class MummySprites(Spritesheet):
 class BirdSprites(Spritesheet):
     def __init__(self, enemy):
         Spritesheet.__init__(self)
-        transcolor = self.sheet.get_at((0, 0))
-        self.sheet.set_colorkey(transcolor)
 
         self.enemy = enemy
         self.startImage = self.getImage(14, 1)
@@ -308,6 +471,9 @@ class BirdSprites(Spritesheet):
     def getImage(self, x, y):
         return Spritesheet.getImage(self, SPRITEFACTOR*x, SPRITEFACTOR*y, SPRITEFACTOR*TILEWIDTH, SPRITEFACTOR*TILEHEIGHT)
 
+    def getFlippedImage(self, x, y):
+        return Spritesheet.getFlippedImage(self, SPRITEFACTOR*x, SPRITEFACTOR*y, SPRITEFACTOR*TILEWIDTH, SPRITEFACTOR*TILEHEIGHT)
+
     def defineAnimations(self):
         horiz_imgs = []
         vert_imgs = []
@@ -316,17 +482,20 @@ class BirdSprites(Spritesheet):
             vert_imgs.append(((i+11), 1))
         self.animations['HORIZ'] = Animator(horiz_imgs)
         self.animations['VERT'] = Animator(vert_imgs)
+        # Mirror the left-pointing frames up front for moving right
+        for frame in horiz_imgs:
+            self.getFlippedImage(*frame)
 
     def update(self, dt):
         e = self.enemy
         # If we are horizontally travelling
         if abs(e.direction) == 1:
-            image = self.getImage(*self.animations['HORIZ'].update(dt))
-            # If we are moving right, flip the left-pointing image
+            frame = self.animations['HORIZ'].update(dt)
+            # If we are moving right, use the mirrored left-pointing image
             if e.direction > 0:
-                image = pygame.transform.flip(image, True, False)
-                image.set_colorkey(image.get_at((0, 0)))
-            e.image = image
+                e.image = self.getFlippedImage(*frame)
+            else:
+                e.image = self.getImage(*frame)
             self.stopimage = (8, 1)
         # If we are veritcally travelling or stationary
         else:
@@ -341,8 +510,6 @@ class BirdSprites(Spritesheet):
 class ClubSprites(Spritesheet):
     def __init__(self, enemy):
         Spritesheet.__init__(self)
-        transcolor = self.sheet.get_at((0, 0))
-        self.sheet.set_colorkey(transcolor)
 
         self.enemy = enemy
         self.startImage = self.getImage(15, 3)
@@ -363,19 +530,24 @@ class ClubSprites(Spritesheet):
     def getImage(self, x, y):
         return Spritesheet.getImage(self, SPRITEFACTOR*x, SPRITEFACTOR*y, SPRITEFACTOR*TILEWIDTH, SPRITEFACTOR*TILEHEIGHT)
 
+    def getFlippedImage(self, x, y):
+        return Spritesheet.getFlippedImage(self, SPRITEFACTOR*x, SPRITEFACTOR*y, SPRITEFACTOR*TILEWIDTH, SPRITEFACTOR*TILEHEIGHT)
+
     def defineAnimations(self):
         imgs = []
         for i in range(4):
             imgs.append(((i+15), 3))
         self.animations['MOVE'] = Animator(imgs)
+        for frame in imgs:
+            self.getFlippedImage(*frame)
 
     def update(self, dt):
         e = self.enemy
-        image = self.getImage(*self.animations['MOVE'].update(dt))
+        frame = self.animations['MOVE'].update(dt)
         if e.direction > 0:
-            image = pygame.transform.flip(image, True, False)
-            image.set_colorkey(image.get_at((0, 0)))
-        e.image = image
+            e.image = self.getFlippedImage(*frame)
+        else:
+            e.image = self.getImage(*frame)
 
     def reset(self):
         for key in list(self.animations.keys()):
@@ -385,8 +557,6 @@ class ClubSprites(Spritesheet):
 class UFOSprites(Spritesheet):
     def __init__(self, enemy):
         Spritesheet.__init__(self)
-        transcolor = self.sheet.get_at((0, 0))
-        self.sheet.set_colorkey(transcolor)
 
         self.enemy = enemy
         self.startImage = self.getImage(0, 3)
@@ -425,8 +595,6 @@ class UFOSprites(Spritesheet):
 class OrbSprites(Spritesheet):
     def __init__(self, enemy):
         Spritesheet.__init__(self)
-        transcolor = self.sheet.get_at((0, 0))
-        self.sheet.set_colorkey(transcolor)
 
         self.enemy = enemy
         self.startImage = self.getImage(11, 2)
@@ -447,19 +615,24 @@ class OrbSprites(Spritesheet):
     def getImage(self, x, y):
         return Spritesheet.getImage(self, SPRITEFACTOR*x, SPRITEFACTOR*y, SPRITEFACTOR*TILEWIDTH, SPRITEFACTOR*TILEHEIGHT)
 
+    def getFlippedImage(self, x, y):
+        return Spritesheet.getFlippedImage(self, SPRITEFACTOR*x, SPRITEFACTOR*y, SPRITEFACTOR*TILEWIDTH, SPRITEFACTOR*TILEHEIGHT)
+
     def defineAnimations(self):
         imgs = []
         for i in range(7):
             imgs.append((9+i, 2))
         self.animations['MOVE'] = Animator(imgs)
+        for frame in imgs:
+            self.getFlippedImage(*frame)
 
     def update(self, dt):
         e = self.enemy
-        image = self.getImage(*self.animations['MOVE'].update(dt))
+        frame = self.animations['MOVE'].update(dt)
         if e.direction > 0:
-            image = pygame.transform.flip(image, True, False)
-            image.set_colorkey(image.get_at((0, 0)))
-        e.image = image
+            e.image = self.getFlippedImage(*frame)
+        else:
+            e.image = self.getImage(*frame)
         self.stopimage = (14, 2)
 
     def reset(self):
@@ -470,8 +643,6 @@ class OrbSprites(Spritesheet):
 class SphereSprites(Spritesheet):
     def __init__(self, enemy):
         Spritesheet.__init__(self)
-        transcolor = self.sheet.get_at((0, 0))
-        self.sheet.set_colorkey(transcolor)
 
         self.enemy = enemy
         self.startImage = self.getImage(0, 2)
@@ -492,19 +663,24 @@ class SphereSprites(Spritesheet):
     def getImage(self, x, y):
         return Spritesheet.getImage(self, SPRITEFACTOR*x, SPRITEFACTOR*y, SPRITEFACTOR*TILEWIDTH, SPRITEFACTOR*TILEHEIGHT)
 
+    def getFlippedImage(self, x, y):
+        return Spritesheet.getFlippedImage(self, SPRITEFACTOR*x, SPRITEFACTOR*y, SPRITEFACTOR*TILEWIDTH, SPRITEFACTOR*TILEHEIGHT)
+
     def defineAnimations(self):
         imgs = []
         for i in range(9):
             imgs.append((i, 2))
         self.animations['MOVE'] = Animator(imgs)
+        for frame in imgs:
+            self.getFlippedImage(*frame)
 
     def update(self, dt):
         e = self.enemy
-        image = self.getImage(*self.animations['MOVE'].update(dt))
+        frame = self.animations['MOVE'].update(dt)
         if e.direction > 0:
-            image = pygame.transform.flip(image, True, False)
-            image.set_colorkey(image.get_at((0, 0)))
-        e.image = image
+            e.image = self.getFlippedImage(*frame)
+        else:
+            e.image = self.getImage(*frame)
         self.stopimage = (14, 2)
 
     def reset(self):
@@ -1,8 +1,43 @@
 # NOTE: The code in this file was inspired by Jonathan Richards' Pacmancode tutorial.
 
 import pygame
+from pygame.locals import BLEND_RGBA_MAX
 from constants import *
-from math import floor
+from profiler import profiler
+
+
+class GlyphAtlas(object):
+    """
+    Prerendered digit glyphs for one font, size and color.
+
+    PressStart2P is monospaced, so a number drawn by placing its digit glyphs
+    side by side is identical to rendering the whole string with the font.
+
+    Attributes:
+        glyphs (dict): The rendered surface of each digit character.
+        atlases (dict): Class-level cache of atlases, keyed by (path, size, color).
+    """
+    atlases = {}
+
+    def __init__(self, font, color):
+        self.glyphs = {}
+        for digit in "0123456789":
+            self.glyphs[digit] = font.render(digit, 1, color)
+
+    @classmethod
+    def get(cls, fontpath, size, color, font):
+        key = (fontpath, size, tuple(color))
+        if key not in cls.atlases:
+            cls.atlases[key] = cls(font, color)
+        return cls.atlases[key]
+
+    def render(self, digits):
+        glyph = self.glyphs["0"]
+        label = pygame.Surface((glyph.get_width()*len(digits), glyph.get_height()), pygame.SRCALPHA)
+        for i, digit in enumerate(digits):
+            # The label starts fully transparent, so MAX copies the glyph exactly
+            label.blit(self.glyphs[digit], (i*glyph.get_width(), 0), special_flags=BLEND_RGBA_MAX)
+        return label
 
 
 class Text(object):
@@ -23,7 +58,13 @@ class Text(object):
         label (pygame.Surface): The rendered text surface.
         destroy (bool): A flag indicating whether the text should be removed.
         font (pygame.font.Font): The font used to render the text.
+        fontpath (str): The path of the font file.
+        fonts (dict): Class-level cache of loaded fonts, keyed by (path, size) and shared by every text.
     """
+    __slots__ = ('id', 'text', 'color', 'size', 'visible', 'x', 'y', 'timer', 'lifespan', 'label',
+                 'destroy', 'fontpath', 'font')
+    fonts = {}
+
     def __init__(self, text, color, x, y, size, time=None, id=None, visible=True):
         self.id = id
         self.text = text
@@ -40,14 +81,28 @@ class Text(object):
         self.createLabel()
 
     def setupFont(self, fontpath):
-        self.font = pygame.font.Font(fontpath, self.size)
+        self.fontpath = fontpath
+        key = (fontpath, self.size)
+        if key not in Text.fonts:
+            with profiler.timed('asset', f"{fontpath} size {self.size}"):
+                Text.fonts[key] = pygame.font.Font(fontpath, self.size)
+        self.font = Text.fonts[key]
 
     def createLabel(self):
-        self.label = self.font.render(self.text, 1, self.color)
+        # Numbers are assembled from prerendered digits instead of rendering the font
+        if self.text.isascii() and self.text.isdigit():
+            self.label = GlyphAtlas.get(self.fontpath, self.size, self.color, self.font).render(self.text)
+        else:
+            self.label = self.font.render(self.text, 1, self.color)
 
     def setText(self, newtext):
-        self.text = str(newtext)
+        """Changes the text, returning False if it was already showing newtext."""
+        newtext = str(newtext)
+        if newtext == self.text:
+            return False
+        self.text = newtext
         self.createLabel()
+        return True
 
     def update(self, dt):
         if self.lifespan is not None:
@@ -57,10 +112,14 @@ class Text(object):
                 self.lifespan = None
                 self.destroy = True
 
+    def get_rect(self):
+        return self.label.get_rect(topleft=(self.x, self.y))
+
     def render(self, screen):
         if self.visible:
             x, y = (self.x, self.y)
-            screen.blit(self.label, (x, y))
+            return screen.blit(self.label, (x, y))
+        return None
 
 
 class TextGroup(object):
@@ -71,10 +130,17 @@ class TextGroup(object):
         nextid (int): The next available ID for a new text object.
         alltext (dict): A dictionary mapping text IDs to their respective Text objects.
         highscore (str): The high score read from a file.
+        hudIds (tuple): The IDs of the score, round and label texts that make up the HUD.
+        hud (list): The (rect, surface) strips above and below the play area, with the HUD texts
+            drawn on black, rebuilt only when one of them changes.
+        hudChanges (list): Rects of HUD texts that changed since the last call to `popHUDChanges`.
     """
     def __init__(self):
         self.nextid = -1
         self.alltext = {}
+        self.hudIds = (SCORETXT, ROUNDTXT, HIGHSCORETXT, SCORELABELTXT, ROUNDLABELTXT, HIGHSCORELABELTXT)
+        self.hud = None
+        self.hudChanges = []
         with open('highscore.txt', 'r') as f:
             self.highscore = f.readline().split()[0]
         self.setupText()
@@ -94,11 +160,11 @@ class TextGroup(object):
                                       TILEWIDTH, SCREENHEIGHT+3*TILEHEIGHT, size)
         self.alltext[HIGHSCORETXT] = Text(self.highscore.zfill(
             8), WHITE, SCREENWIDTH-10*size, 2*size, size)
-        self.alltext[3] = Text("SCORE", WHITE, 0, size-5, size)
-        self.alltext[4] = Text("ROUND", WHITE, SCREENWIDTH/2-2 *
-                               TILEWIDTH, SCREENHEIGHT+2*TILEHEIGHT, size)
-        self.alltext[5] = Text("HI-SCORE", WHITE, SCREENWIDTH-10*size, size, size)
-        self.nextid = 6
+        self.alltext[SCORELABELTXT] = Text("SCORE", WHITE, 0, size-5, size)
+        self.alltext[ROUNDLABELTXT] = Text("ROUND", WHITE, SCREENWIDTH/2-2 *
+                                           TILEWIDTH, SCREENHEIGHT+2*TILEHEIGHT, size)
+        self.alltext[HIGHSCORELABELTXT] = Text("HI-SCORE", WHITE, SCREENWIDTH-10*size, size, size)
+        self.nextid = HIGHSCORELABELTXT+1
 
     def update(self, dt):
         for tkey in list(self.alltext.keys()):
@@ -128,8 +194,49 @@ class TextGroup(object):
 
     def updateText(self, id, value):
         if id in self.alltext.keys():
-            self.alltext[id].setText(value)
+            text = self.alltext[id]
+            oldRect = text.get_rect()
+            if text.setText(value) and id in self.hudIds:
+                self.hud = None
+                self.hudChanges += [oldRect, text.get_rect()]
+
+    def getHUD(self, size):
+        """Returns the HUD strips of a screen of the given size, which hold every HUD text."""
+        if self.hud is None:
+            width, height = size
+            self.hud = []
+            for rect in (pygame.Rect(0, 0, width, 2*TILEHEIGHT),
+                         pygame.Rect(0, height-2*TILEHEIGHT, width, 2*TILEHEIGHT)):
+                strip = pygame.Surface(rect.size).convert()
+                strip.fill(BLACK)
+                for id in self.hudIds:
+                    text = self.alltext[id]
+                    if text.visible:
+                        strip.blit(text.label, (text.x-rect.x, text.y-rect.y))
+                self.hud.append((rect, strip))
+        return self.hud
+
+    def popHUDChanges(self):
+        changes = self.hudChanges
+        self.hudChanges = []
+        return changes
+
+    def renderHUD(self, screen):
+        for rect, strip in self.getHUD(screen.get_size()):
+            screen.blit(strip, rect)
+
+    def restoreHUD(self, screen, area):
+        """Redraws the part of the HUD strips inside area."""
+        for rect, strip in self.getHUD(screen.get_size()):
+            clipped = area.clip(rect)
+            if clipped:
+                screen.blit(strip, clipped, clipped.move(-rect.x, -rect.y))
+
+    def getRects(self):
+        """Returns the rects of every visible floating text, as they will be drawn."""
+        return [text.get_rect() for id, text in self.alltext.items() if text.visible and id not in self.hudIds]
 
     def render(self, screen):
         for tkey in list(self.alltext.keys()):
-            self.alltext[tkey].render(screen)
+            if tkey not in self.hudIds:
+                self.alltext[tkey].render(screen)